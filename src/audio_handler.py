@@ -1,9 +1,15 @@
+import asyncio
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
+from typing import Callable, List
 import numpy as np
+import pygame.event
 import pygame.mixer
 
 from player import Direction, Player
+from sound_assets import SoundAssets
+from spatial_mixer import SpatialMixer
 
 
 class CMajorScale(Enum):
@@ -40,7 +46,13 @@ class Audio:
     }
 
     def __init__(self, sound_buffer, volume=1.0, panning=0.5):
-        self.sound = pygame.mixer.Sound(sound_buffer)
+        """
+        :param sound_buffer: samples to loop, or a Sound which may be shared with other Audios
+        """
+        if isinstance(sound_buffer, pygame.mixer.Sound):
+            self.sound = sound_buffer
+        else:
+            self.sound = pygame.mixer.Sound(sound_buffer)
         self.channel = self.sound.play(loops=-1)
         self.volume = volume
         self.panning = panning
@@ -54,35 +66,142 @@ class Audio:
         :param panning: closer to 0 means further left, closer to 1 means further right
         """
         self.panning = panning
-        self.channel.set_volume(1 - panning, panning)
+        self.channel.set_volume(self.volume * (1 - panning), self.volume * panning)
 
     def set_volume(self, volume: float):
+        """
+        The volume is applied to the channel rather than the sound,
+        so that a Sound can be shared between several Audios
+        """
         self.volume = max(min(volume, Audio.MAX_VOLUME), 0)
-        self.sound.set_volume(self.volume)
+        self.set_panning(self.panning)
+
+
+class Waveform(Enum):
+    Sine = 1
+    Beep = 2
+
+
+class WaveformCache:
+    """
+    Process-wide cache of synthesized sound buffers and the Sounds created from them,
+    evicting the least recently used entry once MAX_ENTRIES is exceeded
+    """
+    MAX_ENTRIES = 32
+    SAMPLE_RATE = 44100
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        """(waveform, frequency, sample rate, length) -> [buffer, Sound or None]"""
+        self.entries = OrderedDict()
+
+    def buffer(self, waveform: Waveform, frequency, sample_rate=SAMPLE_RATE, length=SAMPLE_RATE) -> np.ndarray:
+        """
+        :return: read-only sound buffer, synthesized on first use
+        """
+        return self.entry(waveform, frequency, sample_rate, length)[0]
+
+    def sound(self, waveform: Waveform, frequency, sample_rate=SAMPLE_RATE, length=SAMPLE_RATE) -> pygame.mixer.Sound:
+        """
+        :return: Sound shared by everyone requesting the same waveform, the mixer has to be initialized
+        """
+        entry = self.entry(waveform, frequency, sample_rate, length)
+        if entry[1] is None:
+            entry[1] = pygame.mixer.Sound(entry[0])
+        return entry[1]
+
+    def entry(self, waveform: Waveform, frequency, sample_rate, length) -> list:
+        key = (waveform, frequency, sample_rate, length)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        if waveform == Waveform.Sine:
+            buffer = generate_sine_wave(frequency, sample_rate, length)
+        else:
+            buffer = generate_sine_wave_beep(frequency, sample_rate, length)
+        return self.store(key, buffer)
+
+    def store(self, key, buffer: np.ndarray) -> list:
+        buffer.flags.writeable = False
+        self.entries[key] = [buffer, None]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return self.entries[key]
+
+    def presynthesize(self, frequencies=None, sample_rate=SAMPLE_RATE, length=SAMPLE_RATE):
+        """
+        Synthesize the sine waves of many frequencies in one vectorized call
+
+        :param frequencies: frequencies to synthesize, all of the C3 and C4 major scale if None
+        """
+        if frequencies is None:
+            frequencies = list(Audio.C3_MAJOR_FREQUENCIES.values()) + list(Audio.C4_MAJOR_FREQUENCIES.values())
+        frequencies = [f for f in frequencies if (Waveform.Sine, f, sample_rate, length) not in self.entries]
+
+        buffers = np.sin(
+            2 * np.pi * np.arange(length)[None, :] * np.array(frequencies)[:, None] / sample_rate
+        ).astype(np.float32)
+        for frequency, buffer in zip(frequencies, buffers):
+            self.store((Waveform.Sine, frequency, sample_rate, length), buffer)
+
+    def clear(self):
+        self.entries.clear()
 
 
 class AudioHandler:
     ADJUST_AUDIO_TIMEOUT = 60
+    """posted by pygame when a clip started with play_clip ends"""
+    CLIP_FINISHED = pygame.event.custom_type()
+    """seconds between checks while awaiting a clip"""
+    CLIP_POLL_INTERVAL = 0.01
+    """assets, see sound_assets.asset_path"""
+    COMPLETION_SOUND = "lvl_completed.mp3"
+    GAME_OVER_SOUND = "game_over.mp3"
+
+    """key of the target among the sources of the spatial mixer, walls use their index"""
+    TARGET_SOURCE_KEY = 2 ** 62
+
+    def __init__(self, presynthesize=False, spatial=False, assets: SoundAssets = None):
+        """
+        :param presynthesize: synthesize all tones of the C3 and C4 major scale up front
+        :param spatial: play one positioned source per wall in sight through a SpatialMixer,
+            see set_spatial_sources, instead of the left, center and right tone
+        :param assets: where the clips are loaded from; by default they are decoded on a
+            background thread right away
+        """
+        pygame.mixer.init(frequency=SpatialMixer.SAMPLE_RATE, size=32, channels=2)
+        self.playing_clips: List[(pygame.mixer.Channel, Callable[[], None])] = []
+        if assets is None:
+            assets = SoundAssets()
+            assets.preload([AudioHandler.COMPLETION_SOUND, AudioHandler.GAME_OVER_SOUND])
+        self.assets = assets
+        self.spatial_mixer: SpatialMixer = None
+        if spatial:
+            self.spatial_mixer = SpatialMixer()
+            self.spatial_mixer.start()
+            return
+        if presynthesize:
+            WAVEFORM_CACHE.presynthesize()
 
-    def __init__(self):
-        pygame.mixer.init(size=32)
         self.left_sound = Audio(
-            generate_sine_wave(Audio.C3_MAJOR_FREQUENCIES[CMajorScale.D]),
+            WAVEFORM_CACHE.sound(Waveform.Sine, Audio.C3_MAJOR_FREQUENCIES[CMajorScale.D]),
             panning=Player.DIRECTION_TO_PANNING[Direction.Left],
             volume=0.0
         )
         self.center_sound = Audio(
-            generate_sine_wave(Audio.C4_MAJOR_FREQUENCIES[CMajorScale.E]),
+            WAVEFORM_CACHE.sound(Waveform.Sine, Audio.C4_MAJOR_FREQUENCIES[CMajorScale.E]),
             panning=Player.DIRECTION_TO_PANNING[Direction.Center],
             volume=0.0
         )
         self.right_sound = Audio(
-            generate_sine_wave(Audio.C3_MAJOR_FREQUENCIES[CMajorScale.C]),
+            WAVEFORM_CACHE.sound(Waveform.Sine, Audio.C3_MAJOR_FREQUENCIES[CMajorScale.C]),
             panning=Player.DIRECTION_TO_PANNING[Direction.Right],
             volume=0.0
         )
         self.target_audio = Audio(
-            generate_sine_wave_beep(Audio.C3_MAJOR_FREQUENCIES[CMajorScale.B]),
+            WAVEFORM_CACHE.sound(Waveform.Beep, Audio.C3_MAJOR_FREQUENCIES[CMajorScale.B]),
             panning=Player.DIRECTION_TO_PANNING[Direction.Center],
             volume=0.0
         )
@@ -105,44 +224,143 @@ class AudioHandler:
 
     @staticmethod
     def distance_to_volume(distance, max_distance) -> float:
-        return (1 - distance / max_distance) * Audio.MAX_VOLUME
+        return max(1 - distance / max_distance, 0) * Audio.MAX_VOLUME
 
-    def play_completion_sound(self):
-        self.set_volume(0.0, 0.0, 0.0)
-        self.set_target_volume(0.0)
+    @staticmethod
+    def distances_to_volumes(distances: np.ndarray, max_distance) -> np.ndarray:
+        return np.maximum(1 - distances / max_distance, 0) * Audio.MAX_VOLUME
+
+    @staticmethod
+    def angles_to_pannings(relative_rads: np.ndarray) -> np.ndarray:
+        """
+        Continuous counterpart of Player.DIRECTION_TO_PANNING
+
+        :param relative_rads: angles relative to the player's direction, positive to the left
+        """
+        left = Player.DIRECTION_TO_PANNING[Direction.Left]
+        center = Player.DIRECTION_TO_PANNING[Direction.Center]
+        offsets = np.clip(relative_rads / Player.VIEWING_BOUNDS.angle.rad, -1, 1)
+        return center + offsets * (left - center)
+
+    def set_spatial_sources(
+        self,
+        keys: np.ndarray, relative_rads: np.ndarray, volumes: np.ndarray,
+        target_relative_rad: float, target_volume: float
+    ):
+        """
+        Play one tone per wall and a beep for the target, each panned to where it is
 
-        sound = pygame.mixer.Sound("../assets/lvl_completed.mp3")
-        channel = sound.play()
-        while channel.get_busy():
-            pass
+        :param keys: stable key per wall, e.g. its index
+        :param relative_rads: angle per wall relative to the player's direction, positive to the left
+        :param volumes: volume per wall
+        """
+        wall_frequency = Audio.C4_MAJOR_FREQUENCIES[CMajorScale.E]
+        target_frequency = Audio.C3_MAJOR_FREQUENCIES[CMajorScale.B]
+        """detune the walls slightly, so that equal tones do not cancel out"""
+        frequencies = wall_frequency * (1 + 0.01 * (keys % 7))
+
+        self.spatial_mixer.update(
+            np.append(keys, AudioHandler.TARGET_SOURCE_KEY),
+            np.append(frequencies, target_frequency),
+            np.append(volumes, target_volume),
+            AudioHandler.angles_to_pannings(np.append(relative_rads, target_relative_rad)),
+            np.append(np.zeros(len(keys), dtype=bool), True)
+        )
+
+    def close(self):
+        """stop the spatial mixer's stream, if any"""
+        if self.spatial_mixer is not None:
+            self.spatial_mixer.close()
 
-    def play_game_over_sound(self):
+    def silence(self):
+        if self.spatial_mixer is not None:
+            self.spatial_mixer.silence()
+            return
         self.set_volume(0.0, 0.0, 0.0)
         self.set_target_volume(0.0)
 
-        sound = pygame.mixer.Sound("../assets/game_over.mp3")
-        channel = sound.play()
-        while channel.get_busy():
-            pass
+    def play_clip(self, name: str, on_finished: Callable[[], None] = None) -> pygame.mixer.Channel:
+        """
+        Play a sound asset once without waiting for it to finish
+
+        :param name: asset to play, loaded through self.assets
+        :param on_finished: called from handle_event once the clip has ended
+        :return: the channel playing the clip, None if no channel was free
+        """
+        channel = self.assets.get(name).play()
+        if channel is None:
+            if on_finished is not None:
+                on_finished()
+            return None
 
+        channel.set_endevent(AudioHandler.CLIP_FINISHED)
+        self.playing_clips.append((channel, on_finished))
+        return channel
 
-def generate_sine_wave(frequency: int) -> np.ndarray:
+    async def play_clip_async(self, name: str):
+        """
+        Play a sound asset once, the returned coroutine completes when the clip has ended
+        """
+        channel = self.play_clip(name)
+        while channel is not None and channel.get_busy():
+            await asyncio.sleep(AudioHandler.CLIP_POLL_INTERVAL)
+
+    def handle_event(self, event: pygame.event.Event):
+        """
+        Has to be called with the events of the game loop, so that the
+        callbacks of finished clips are run
+        """
+        if event.type == AudioHandler.CLIP_FINISHED:
+            self.dispatch_finished_clips()
+
+    def dispatch_finished_clips(self):
+        finished = [(channel, callback) for channel, callback in self.playing_clips if not channel.get_busy()]
+        self.playing_clips = [clip for clip in self.playing_clips if clip not in finished]
+
+        for channel, callback in finished:
+            channel.set_endevent()
+            if callback is not None:
+                callback()
+
+    def is_playing_clip(self) -> bool:
+        return any(channel.get_busy() for channel, _ in self.playing_clips)
+
+    def play_completion_sound(self, on_finished: Callable[[], None] = None) -> pygame.mixer.Channel:
+        self.silence()
+
+        return self.play_clip(AudioHandler.COMPLETION_SOUND, on_finished)
+
+    def play_game_over_sound(self, on_finished: Callable[[], None] = None) -> pygame.mixer.Channel:
+        self.silence()
+
+        return self.play_clip(AudioHandler.GAME_OVER_SOUND, on_finished)
+
+
+def generate_sine_wave(frequency: int, sample_rate=WaveformCache.SAMPLE_RATE, length=WaveformCache.SAMPLE_RATE) -> np.ndarray:
     """
     Generate a monotone sound
 
     :param frequency: frequency of sound
+    :param sample_rate: samples per second
+    :param length: number of samples
     :return: sound buffer
     """
-    return np.sin(2 * np.pi * np.arange(44100) * frequency / 44100).astype(np.float32)
+    return np.sin(2 * np.pi * np.arange(length) * frequency / sample_rate).astype(np.float32)
 
 
-def generate_sine_wave_beep(frequency: int) -> np.ndarray:
+def generate_sine_wave_beep(frequency: int, sample_rate=WaveformCache.SAMPLE_RATE, length=WaveformCache.SAMPLE_RATE) -> np.ndarray:
     """
     Generate a beeping sound
 
     :param frequency: frequency of sound
+    :param sample_rate: samples per second, the beep itself is always BEEP_LENGTH samples long
+    :param length: number of samples
     :return: sound buffer
     """
-    buffer = np.zeros(44100).astype(np.float32)
-    buffer[:5000] = np.sin(2 * np.pi * np.arange(5000) * frequency / 5000).astype(np.float32)
+    buffer = np.zeros(length).astype(np.float32)
+    buffer[:BEEP_LENGTH] = np.sin(2 * np.pi * np.arange(BEEP_LENGTH) * frequency / BEEP_LENGTH).astype(np.float32)
     return buffer
+
+
+BEEP_LENGTH = 5000
+WAVEFORM_CACHE = WaveformCache()
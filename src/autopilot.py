@@ -0,0 +1,70 @@
+import numpy as np
+
+from controls import Controls
+from engine import StepResult
+from level import Level
+from player import Player
+
+
+class Autopilot:
+    """
+    Controller steering the player along the shortest route to the target,
+    looked up in the level's flow field instead of searched for.
+    The player is led from cell center to cell center and turns on the spot,
+    so it never gets closer to a wall than half a cell minus its body radius.
+    """
+    """a cell center counts as reached within this fraction of the smaller cell side"""
+    ARRIVAL_RADIUS_IN_CELLS = 0.2
+    """the player only moves forward while its heading is off by less than this"""
+    MAX_HEADING_ERROR = np.pi / 16
+
+    def __init__(self, level: Level):
+        self.level = level
+        self.arrival_radius = Autopilot.ARRIVAL_RADIUS_IN_CELLS * min(level.cell_width, level.cell_height)
+        """cell whose center the player heads for and the cell it comes from"""
+        self.goal_cell = None
+        self.previous_cell = None
+
+    def __call__(self, state: StepResult) -> Controls:
+        waypoint = self.waypoint(state.position)
+        dx = waypoint[0] - state.position.x
+        dy = waypoint[1] - state.position.y
+
+        """flip y-coordinate system because pixel coordinate system is upside down"""
+        heading = np.arctan2(-dy, dx)
+        error = (heading - state.direction.rad + np.pi) % (2 * np.pi) - np.pi
+        turn = abs(error) > Player.TURNING_SPEED.rad / 2
+
+        return Controls(
+            forward=abs(error) < Autopilot.MAX_HEADING_ERROR,
+            left=turn and error > 0,
+            right=turn and error < 0
+        )
+
+    def waypoint(self, position) -> (float, float):
+        """
+        :return: the center of the goal cell, or the target once the goal is the target cell.
+            The goal moves on along the route when its center has been reached.
+        """
+        level = self.level
+        cell = level.cell_at(position)
+        if cell != self.goal_cell and cell != self.previous_cell:
+            """started or pushed off the route, head for the center of the current cell first"""
+            self.goal_cell = self.previous_cell = cell
+
+        if self.goal_cell == level.target_cell:
+            return level.target.x, level.target.y
+
+        center = level.cell_center(*self.goal_cell)
+        if center.distance_to(position) <= self.arrival_radius:
+            self.previous_cell = self.goal_cell
+            self.goal_cell = level.route_step(*self.goal_cell)
+            if self.goal_cell == level.target_cell:
+                return level.target.x, level.target.y
+            center = level.cell_center(*self.goal_cell)
+        return center.x, center.y
+
+
+def autopilot_controller(seed: int, level: Level) -> Autopilot:
+    """controller factory for episode_runner.run_episode"""
+    return Autopilot(level)
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+import numpy as np
+
+from engine import GameStatus
+from level import Geometry, Level
+from player import Player
+
+TWO_PI = 2 * np.pi
+
+
+@dataclass
+class BatchStepResult:
+    """state of all agents after one step, one row per agent"""
+    x: np.ndarray
+    y: np.ndarray
+    direction: np.ndarray
+    """closest obstacle to the left, center and right, shape (agents, 3)"""
+    closest: np.ndarray
+    status: np.ndarray
+
+
+class BatchEngine:
+    """
+    Many players moving through the same level in lockstep. Poses are kept in
+    arrays and every step is computed for all agents at once, following the
+    semantics of Player and Engine.step.
+    Only levels with Geometry.Points are supported.
+    """
+    """upper bound on agents * obstacles per array operation, to bound memory"""
+    MAX_PAIRS_PER_CHUNK = 1 << 20
+
+    def __init__(self, level: Level, num_agents: int, screen_dimensions: (int, int)):
+        if level.geometry != Geometry.Points:
+            raise ValueError('BatchEngine only supports levels with Geometry.Points')
+
+        self.level = level
+        self.num_agents = num_agents
+        self.screen_dimensions = screen_dimensions
+
+        self.x = np.full(num_agents, level.start_position[0], dtype=np.float64)
+        self.y = np.full(num_agents, level.start_position[1], dtype=np.float64)
+        self.direction = np.full(num_agents, np.pi / 2, dtype=np.float64)
+        self.status = np.full(num_agents, GameStatus.Running.value, dtype=np.int8)
+        self.closest = np.full((num_agents, 3), level.viewing_bounds.radius + 1)
+
+    def running(self) -> np.ndarray:
+        return self.status == GameStatus.Running.value
+
+    def turn_left(self, mask: np.ndarray):
+        turned = (self.direction + Player.TURNING_SPEED.rad) % TWO_PI
+        self.direction = np.where(mask, turned, self.direction)
+
+    def turn_right(self, mask: np.ndarray):
+        self.direction = np.where(mask, wrap_negative(self.direction - Player.TURNING_SPEED.rad), self.direction)
+
+    def move_forward(self, mask: np.ndarray):
+        next_x = self.x + Player.MOVEMENT_SPEED * np.cos(self.direction)
+        next_y = self.y + -Player.MOVEMENT_SPEED * np.sin(self.direction)
+        move = mask & self.is_in_screen_bounds(next_x, next_y)
+        self.x = np.where(move, next_x, self.x)
+        self.y = np.where(move, next_y, self.y)
+
+    def is_in_screen_bounds(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return (
+            (0 < y) & (y < self.screen_dimensions[1])
+            & (0 < x) & (x < self.screen_dimensions[0])
+        )
+
+    def sense(self, agents: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        Scan the obstacles around the given agents, like ObstacleStore.scan
+
+        :param agents: indices of the agents to scan for
+        :return: collision flag per agent and closest distance per direction, shape (agents, 3)
+        """
+        store = self.level.obstacle_store
+        radius = self.level.viewing_bounds.radius
+        collided = np.zeros(len(agents), dtype=bool)
+        closest = np.full((len(agents), 3), radius + 1)
+
+        chunk_size = max(self.MAX_PAIRS_PER_CHUNK // max(len(store), 1), 1)
+        for start in range(0, len(agents), chunk_size):
+            chunk = agents[start:start + chunk_size]
+            direction = self.direction[chunk, None]
+
+            dx = store.x[None, :] - self.x[chunk, None]
+            dy = store.y[None, :] - self.y[chunk, None]
+            rads = wrap_negative(np.arctan2(-dy, dx))
+            distances = np.sqrt(dx * dx + dy * dy)
+
+            """frustum and section bounds, computed like the Angle arithmetic in Player"""
+            angle = self.level.viewing_bounds.angle.rad
+            section_arc_length = (angle * (2 / 3)) % TWO_PI
+            left_bound = (direction + angle) % TWO_PI
+            right_bound = wrap_negative(direction - angle)
+            left_center_bound = wrap_negative(left_bound - section_arc_length)
+            right_center_bound = (right_bound + section_arc_length) % TWO_PI
+
+            visible = (distances <= radius) & in_bounds(rads, right_bound, left_bound)
+            collided[start:start + len(chunk)] = (visible & (distances <= Player.BODY_RADIUS)).any(axis=1)
+
+            is_left = in_bounds(rads, left_center_bound, left_bound)
+            is_center = ~is_left & in_bounds(rads, right_center_bound, left_center_bound)
+            is_right = ~is_left & ~is_center
+            for column, in_direction in enumerate((is_left, is_center, is_right)):
+                sector_distances = np.where(visible & in_direction, distances, np.inf).min(axis=1)
+                closest[start:start + len(chunk), column] = np.where(
+                    np.isfinite(sector_distances), sector_distances, radius + 1
+                )
+
+        return collided, closest
+
+    def step(self, forward: np.ndarray, left: np.ndarray, right: np.ndarray) -> BatchStepResult:
+        """
+        Advance all running agents by one frame: scan the surroundings, then apply the controls
+
+        :param forward: per agent, whether it moves forward
+        :param left: per agent, whether it turns left
+        :param right: per agent, whether it turns right
+        :return: the state after the frame
+        """
+        agents = np.flatnonzero(self.running())
+        collided, closest = self.sense(agents)
+        self.closest[agents] = closest
+
+        """a collision ends the game before the target is checked, like in Engine.scan_surroundings"""
+        target_dx = self.x[agents] - self.level.target.x
+        target_dy = self.y[agents] - self.level.target.y
+        reached_target = np.sqrt(target_dx * target_dx + target_dy * target_dy) < Level.TARGET_RADIUS + Player.BODY_RADIUS
+
+        self.status[agents[collided]] = GameStatus.Lost.value
+        self.status[agents[~collided & reached_target]] = GameStatus.Won.value
+
+        running = self.running()
+        self.move_forward(running & forward)
+        self.turn_left(running & left)
+        self.turn_right(running & right)
+        return self.result()
+
+    def result(self) -> BatchStepResult:
+        return BatchStepResult(
+            self.x.copy(),
+            self.y.copy(),
+            self.direction.copy(),
+            self.closest.copy(),
+            self.status.copy()
+        )
+
+
+def wrap_negative(rads: np.ndarray) -> np.ndarray:
+    """shift negative angles by 2PI, like Angle.__isub__"""
+    return np.where(rads < 0, rads + TWO_PI, rads)
+
+
+def in_bounds(rads: np.ndarray, lb: np.ndarray, ub: np.ndarray) -> np.ndarray:
+    """Angle.is_in_bounds with per-row bounds"""
+    return np.where(
+        lb > ub,
+        (rads < ub) | (rads > lb),
+        (rads < ub) & (rads > lb)
+    )
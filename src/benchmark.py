@@ -0,0 +1,244 @@
+import os
+
+"""run without window and audio device, has to happen before pygame is initialized"""
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+import pygame
+
+from engine import Engine
+from level import Geometry, Level, Obstacle
+from maze import MazeAlgorithm, carve_maze, flow_field
+from math_utils import *
+from player import Player
+from ray_caster import RayScanner
+from renderer import DirtyRectRenderer, draw_objects, draw_player
+
+SCREEN_DIMENSIONS = (1200, 800)
+DEFAULT_MAZE_SIZES = (4, 16, 64)
+DEFAULT_OBSTACLE_SPACINGS = (Obstacle.DEFAULT_RADIUS, 2 * Obstacle.DEFAULT_RADIUS)
+DEFAULT_REPEAT = 200
+"""a benchmark regresses if its median latency grows by more than this factor"""
+DEFAULT_THRESHOLD = 1.25
+
+
+def measure(name: str, params: Dict, operation: Callable[[], None], repeat: int) -> Dict:
+    """
+    Time an operation and count its allocations
+
+    :param name: name of the benchmarked operation
+    :param params: parameters of this run, part of the benchmark key
+    :param operation: called repeat times for timing, plus a few times with tracemalloc enabled
+    :param repeat: number of timed calls
+    :return: latency percentiles in microseconds and allocation statistics
+    """
+    operation()
+
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        operation()
+        samples[i] = time.perf_counter_ns() - start
+    samples /= 1000
+
+    allocation_runs = min(repeat, 5)
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    for _ in range(allocation_runs):
+        operation()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    net_blocks = (sys.getallocatedblocks() - blocks_before) / allocation_runs
+
+    return {
+        'name': name,
+        'params': params,
+        'key': benchmark_key(name, params),
+        'repeat': repeat,
+        'mean_us': float(samples.mean()),
+        'p50_us': float(np.percentile(samples, 50)),
+        'p90_us': float(np.percentile(samples, 90)),
+        'p99_us': float(np.percentile(samples, 99)),
+        'peak_bytes': int(peak_bytes),
+        'net_blocks_per_call': float(net_blocks),
+    }
+
+
+def benchmark_key(name: str, params: Dict) -> str:
+    return name + ''.join(f' {k}={v}' for k, v in sorted(params.items()))
+
+
+def random_poses(count: int, viewing_bounds: PolarCoordinate = None, seed=0) -> List[Player]:
+    rng = np.random.default_rng(seed)
+    return [
+        Player(
+            Position(rng.uniform(0, SCREEN_DIMENSIONS[0]), rng.uniform(0, SCREEN_DIMENSIONS[1])),
+            Angle(rng.uniform(0, 2 * np.pi)),
+            SCREEN_DIMENSIONS,
+            viewing_bounds
+        )
+        for _ in range(count)
+    ]
+
+
+def cycle(items: List) -> Callable[[], object]:
+    """endless round robin over items, so repeated calls do not hit the same input"""
+    state = {'index': 0}
+
+    def next_item():
+        item = items[state['index'] % len(items)]
+        state['index'] += 1
+        return item
+
+    return next_item
+
+
+def run_suite(
+    maze_sizes=DEFAULT_MAZE_SIZES,
+    obstacle_spacings=DEFAULT_OBSTACLE_SPACINGS,
+    repeat=DEFAULT_REPEAT
+) -> List[Dict]:
+    screen = pygame.display.set_mode(SCREEN_DIMENSIONS)
+    text = pygame.Surface((1, 1))
+    results = []
+    poses = random_poses(64)
+
+    for size in maze_sizes:
+        seeds = cycle(list(range(16)))
+        results.append(measure(
+            'generate_maze', {'size': size},
+            lambda: Level(size, size, seed=seeds()),
+            max(repeat // 10, 5)
+        ))
+
+        for algorithm in MazeAlgorithm:
+            rng = np.random.default_rng(0)
+            results.append(measure(
+                'carve_maze', {'size': size, 'algorithm': algorithm.name},
+                lambda: carve_maze(algorithm, size, size, 0, 0, rng),
+                max(repeat // 10, 5)
+            ))
+
+        maze = Level(size, size, seed=0)
+        results.append(measure(
+            'flow_field', {'size': size},
+            lambda: flow_field(maze.walls, *maze.target_cell),
+            max(repeat // 10, 5)
+        ))
+
+        maze.place_in_screen(*SCREEN_DIMENSIONS, Obstacle.DEFAULT_RADIUS)
+        """all levels of this size share the viewing bounds"""
+        poses = random_poses(64, maze.viewing_bounds)
+        scanner = RayScanner(maze.walls, maze.cell_width, maze.cell_height, Level.RAY_COUNT)
+        next_pose = cycle(poses)
+        results.append(measure(
+            'ray_scan', {'size': size, 'rays': Level.RAY_COUNT},
+            lambda: scanner.scan(next_pose()),
+            repeat
+        ))
+
+        for geometry in Geometry:
+            for spacing in obstacle_spacings if geometry == Geometry.Points else [None]:
+                params = {'size': size, 'geometry': geometry.name}
+                if spacing is not None:
+                    params['spacing'] = spacing
+
+                def generate_objects():
+                    level = Level(size, size, seed=0)
+                    level.generate_objects(*SCREEN_DIMENSIONS, spacing or Obstacle.DEFAULT_RADIUS, geometry)
+                    return level
+
+                results.append(measure('generate_objects', dict(params), generate_objects, max(repeat // 10, 5)))
+                level = generate_objects()
+                params['obstacles'] = len(level.obstacle_store) + len(level.wall_segments)
+
+                engine = Engine(SCREEN_DIMENSIONS, (size, size), geometry)
+                engine.level = level
+                next_pose = cycle(poses)
+
+                def scan():
+                    engine.player = next_pose()
+                    engine.scan_surroundings(True)
+
+                results.append(measure('scan_surroundings', params, scan, repeat))
+
+                def redraw_full():
+                    screen.fill('black')
+                    draw_objects(screen, level)
+                    draw_player(screen, next_pose())
+                    pygame.display.flip()
+
+                results.append(measure('redraw_full', params, redraw_full, repeat))
+
+                renderer = DirtyRectRenderer(screen, level, level.start_position, text, 'black', 'red')
+                results.append(measure('redraw_dirty', params, lambda: renderer.render(next_pose()), repeat))
+
+    player = poses[0]
+    point = Position(600, 400)
+    polar = PolarCoordinate(Angle(1.0), 100)
+    results.append(measure(
+        'world_position_to_relative_polar_coordinate', {},
+        lambda: player.world_position_to_relative_polar_coordinate(point), repeat
+    ))
+    results.append(measure(
+        'relative_polar_coordinate_to_world_position', {},
+        lambda: player.relative_polar_coordinate_to_world_position(polar), repeat
+    ))
+    results.append(measure('to_cartesian', {}, polar.to_cartesian, repeat))
+    results.append(measure('angle_arithmetic', {}, lambda: (polar.angle + Angle(0.5)) - Angle(2.0), repeat))
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold=DEFAULT_THRESHOLD) -> List[str]:
+    """
+    :return: a description of every benchmark whose median latency exceeds threshold times its baseline
+    """
+    baseline_by_key = {result['key']: result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(result['key'])
+        if reference is None:
+            continue
+        ratio = result['p50_us'] / reference['p50_us']
+        if ratio > threshold:
+            regressions.append(
+                f"{result['key']}: {reference['p50_us']:.1f}us -> {result['p50_us']:.1f}us ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark maze generation, scanning and rendering')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_MAZE_SIZES)
+    parser.add_argument('--spacings', type=float, nargs='+', default=DEFAULT_OBSTACLE_SPACINGS)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', default='bench_output.json', help='where to write the results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.spacings, args.repeat)
+    for result in results:
+        print(f"{result['key']:<70} p50 {result['p50_us']:>10.1f}us  p99 {result['p99_us']:>10.1f}us")
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
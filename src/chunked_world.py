@@ -0,0 +1,276 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
+import numpy as np
+
+from level import Geometry, Level
+from math_utils import PolarCoordinate, Position
+from maze import WALL_LEFT, WALL_UP, carve_dfs
+from obstacle_store import ScanResult
+from player import Player
+from wall_segments import WallSegments
+
+ChunkKey = Tuple[int, int]
+
+
+@dataclass
+class Chunk:
+    """square part of a chunked world, a maze of its own with openings to its neighbours"""
+    key: ChunkKey
+    """WALL_UP and WALL_LEFT bits per cell, indexed by [x, y] within the chunk"""
+    walls: np.ndarray
+    """top and left walls of the chunk in world coordinates, its bottom and right walls belong to the neighbours"""
+    segments: WallSegments
+
+    @property
+    def nbytes(self) -> int:
+        return self.walls.nbytes + self.segments.nbytes
+
+
+def build_chunk(seed: int, key: ChunkKey, chunk_size: int, cell_size: float, openings: int) -> Chunk:
+    """
+    Generate one chunk, only depending on the world seed and the chunk coordinates.
+    Every chunk owns its top and left border, so neighbouring chunks agree on the
+    borders between them no matter in which order they are generated.
+    The borders of the outermost chunks, at the top and left edge of the world, stay closed.
+
+    :param key: chunk coordinates, both non-negative
+    :param chunk_size: cells per side of the chunk
+    :param cell_size: width and height of a cell in world coordinates
+    :param openings: number of passages through each of the chunk's own borders
+    """
+    cx, cy = key
+    rng = np.random.default_rng(np.random.SeedSequence([seed, cx, cy]))
+    walls = carve_dfs(chunk_size, chunk_size, *rng.integers(0, chunk_size, size=2), rng)
+
+    if cy > 0:
+        walls[rng.choice(chunk_size, size=openings, replace=False), 0] &= ~np.uint8(WALL_UP)
+    if cx > 0:
+        walls[0, rng.choice(chunk_size, size=openings, replace=False)] &= ~np.uint8(WALL_LEFT)
+
+    segments = WallSegments.from_walls(
+        (walls & WALL_UP).astype(bool), (walls & WALL_LEFT).astype(bool),
+        cell_size, cell_size,
+        closed_borders=False,
+        origin=(cx * chunk_size * cell_size, cy * chunk_size * cell_size)
+    )
+    return Chunk(key, walls, segments)
+
+
+class ChunkCache:
+    """
+    Chunks of a world generated on demand. Chunks around the player are generated
+    ahead of time on a background thread; the least recently used chunks are
+    evicted once the resident chunks exceed the memory budget.
+    Only the generation runs in the background, the bookkeeping happens in the
+    calling thread.
+    """
+    CHUNK_SIZE = 16
+    CELL_SIZE = 100
+    OPENINGS_PER_BORDER = 2
+    """chunks within this many chunks of the player's chunk are kept resident"""
+    RESIDENT_RADIUS = 1
+    """chunks within this many chunks of the player's chunk are generated in the background"""
+    PREFETCH_RADIUS = 2
+    """
+    room for about 50 chunks of the default size, twice the (2 * PREFETCH_RADIUS + 1) ** 2
+    chunks around the player, so chunks left behind are evicted soon after
+    """
+    MEMORY_BUDGET_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        seed: int,
+        chunk_size=CHUNK_SIZE,
+        cell_size=CELL_SIZE,
+        openings=OPENINGS_PER_BORDER,
+        memory_budget_bytes=MEMORY_BUDGET_BYTES,
+        prefetch=True
+    ):
+        """
+        :param prefetch: if False, chunks are only generated when they are needed
+        """
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.cell_size = cell_size
+        self.openings = openings
+        self.memory_budget_bytes = memory_budget_bytes
+        self.chunk_extent = chunk_size * cell_size
+
+        self.chunks: OrderedDict[ChunkKey, Chunk] = OrderedDict()
+        self.memory_usage = 0
+        self.pending: Dict[ChunkKey, Future] = {}
+        """chunk of the last update and the chunks resident around it"""
+        self.center_key: ChunkKey = None
+        self.required: List[Chunk] = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chunks') if prefetch else None
+
+    def key_of(self, position) -> ChunkKey:
+        return (
+            max(int(position[0] // self.chunk_extent), 0),
+            max(int(position[1] // self.chunk_extent), 0)
+        )
+
+    def build(self, key: ChunkKey) -> Chunk:
+        return build_chunk(self.seed, key, self.chunk_size, self.cell_size, self.openings)
+
+    def get(self, key: ChunkKey) -> Chunk:
+        """
+        :return: the chunk, waiting for its prefetch or generating it if it is not resident
+        """
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+
+        future = self.pending.pop(key, None)
+        chunk = future.result() if future is not None else self.build(key)
+        self.insert(chunk)
+        return chunk
+
+    def insert(self, chunk: Chunk):
+        self.chunks[chunk.key] = chunk
+        self.memory_usage += chunk.nbytes
+
+    def prefetch(self, keys: List[ChunkKey]):
+        """generate the given chunks on the background thread, unless resident or pending"""
+        if self.executor is None:
+            return
+        for key in keys:
+            if key not in self.chunks and key not in self.pending:
+                self.pending[key] = self.executor.submit(self.build, key)
+
+    def collect_prefetched(self):
+        """make the chunks generated in the background resident"""
+        done = [key for key, future in self.pending.items() if future.done()]
+        for key in done:
+            self.insert(self.pending.pop(key).result())
+
+    def neighbourhood(self, key: ChunkKey, radius: int) -> List[ChunkKey]:
+        cx, cy = key
+        return [
+            (x, y)
+            for y in range(max(cy - radius, 0), cy + radius + 1)
+            for x in range(max(cx - radius, 0), cx + radius + 1)
+        ]
+
+    def update(self, position) -> List[Chunk]:
+        """
+        Keep the chunks around position resident, prefetch the ones further out
+        and evict the least recently used ones beyond the memory budget
+
+        :return: the chunks within RESIDENT_RADIUS of position
+        """
+        key = self.key_of(position)
+        if key == self.center_key:
+            return self.required
+
+        self.collect_prefetched()
+        self.prefetch(self.neighbourhood(key, ChunkCache.PREFETCH_RADIUS))
+        required = [self.get(neighbour) for neighbour in self.neighbourhood(key, ChunkCache.RESIDENT_RADIUS)]
+        self.evict({chunk.key for chunk in required})
+        self.center_key = key
+        self.required = required
+        return required
+
+    def evict(self, keep):
+        """
+        :param keep: keys of the chunks which stay resident regardless of the budget
+        """
+        candidates = iter(list(self.chunks))
+        while self.memory_usage > self.memory_budget_bytes:
+            key = next(candidates, None)
+            if key is None:
+                break
+            if key not in keep:
+                self.memory_usage -= self.chunks.pop(key).nbytes
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ChunkedLevel:
+    """
+    Unbounded level extending to the right and downwards, made of chunks generated
+    on demand. Offers the part of the Level interface used by Engine and the renderer;
+    walls are always Geometry.Segments and only the resident chunks around the player
+    are scanned.
+    """
+    """the target lies this many chunks to the right and below the start chunk"""
+    TARGET_DISTANCE_IN_CHUNKS = 3
+
+    def __init__(self, seed: int, chunks: ChunkCache = None):
+        self.seed = seed
+        self.chunks = chunks if chunks is not None else ChunkCache(seed)
+        self.geometry = Geometry.Segments
+        self.distance_field = None
+        self.screen_dimensions = (np.inf, np.inf)
+        self.cell_width = self.cell_height = self.chunks.cell_size
+        self.viewing_bounds = PolarCoordinate(
+            Player.VIEWING_BOUNDS.angle,
+            Player.VIEWING_RADIUS_IN_CELLS * self.chunks.cell_size
+        )
+
+        rng = np.random.default_rng(np.random.SeedSequence([seed]))
+        size = self.chunks.chunk_size
+        self.start_cell = tuple(int(c) for c in rng.integers(0, size, size=2))
+        self.target_cell = tuple(
+            int(c) + ChunkedLevel.TARGET_DISTANCE_IN_CHUNKS * size
+            for c in rng.integers(0, size, size=2)
+        )
+        self.start_position = self.cell_center(*self.start_cell)
+        self.target = self.cell_center(*self.target_cell)
+
+        """resident chunks around the player"""
+        self.resident: List[Chunk] = []
+        """chunks overlapping the frustum at the last scan and their merged segments, in sight or not"""
+        self.scanned_keys: Tuple[ChunkKey, ...] = ()
+        self.wall_segments = WallSegments([], [], [], [])
+        self.last_scanned_frustum = None
+        self.last_scan: ScanResult = None
+        self.resident = self.chunks.update(self.start_position)
+
+    def cell_center(self, x, y) -> Position:
+        return Position(self.cell_width * (x + 0.5), self.cell_height * (y + 0.5))
+
+    def scan_obstacles(self, player: Player) -> ScanResult:
+        """
+        Scan the segments of the resident chunks overlapping the player's frustum,
+        see Level.scan_obstacles. Level.RAY_CAST_SCAN is not supported, chunks are not
+        part of one maze grid the rays could be cast through.
+        """
+        if Level.RAY_CAST_SCAN:
+            raise ValueError('ChunkedLevel does not support Level.RAY_CAST_SCAN')
+        self.resident = self.chunks.update(player.position)
+        frustum = player.frustum()
+        if Level.INCREMENTAL_SCAN and frustum is self.last_scanned_frustum:
+            return replace(self.last_scan, tested=0)
+
+        x_min, y_min, x_max, y_max = frustum.bounding_box
+        first = self.chunks.key_of((x_min, y_min))
+        last = self.chunks.key_of((x_max, y_max))
+        keys = tuple(
+            (x, y)
+            for y in range(first[1], last[1] + 1)
+            for x in range(first[0], last[0] + 1)
+        )
+        if keys != self.scanned_keys:
+            chunks = [self.chunks.get(key) for key in keys]
+            self.scanned_keys = keys
+            self.wall_segments = WallSegments(*(
+                np.concatenate([getattr(chunk.segments, name) for chunk in chunks])
+                for name in ('x0', 'y0', 'x1', 'y1')
+            ))
+
+        self.last_scan = self.wall_segments.scan(player)
+        self.last_scanned_frustum = frustum
+        return self.last_scan
+
+    def sources_in_sight(self, player: Player) -> (np.ndarray, np.ndarray, np.ndarray):
+        """see Level.sources_in_sight, keys only stay stable while the player's frustum stays in the same chunks"""
+        return self.wall_segments.sources_in_sight(player)
+
+    def close(self):
+        self.chunks.close()
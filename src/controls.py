@@ -1,17 +1,37 @@
+from dataclasses import dataclass
 import pygame.key
 
 from player import Player
 
 
-def handle_player_controls(player: Player):
+@dataclass
+class Controls:
+    """state of the player controls during one frame"""
+    forward: bool = False
+    left: bool = False
+    right: bool = False
+
+
+def read_controls() -> Controls:
     keys = pygame.key.get_pressed()
-    if keys[pygame.K_w]:
-        player.move_forward()
+    return Controls(
+        forward=keys[pygame.K_w],
+        left=keys[pygame.K_LEFT],
+        right=keys[pygame.K_RIGHT]
+    )
+
+
+def apply_controls(player: Player, controls: Controls, dt=Player.TICK_MS):
+    """
+    :param dt: milliseconds the controls are held for
+    """
+    if controls.forward:
+        player.move_forward(dt)
 
-    if keys[pygame.K_LEFT]:
-        player.turn_left()
-    if keys[pygame.K_RIGHT]:
-        player.turn_right()
+    if controls.left:
+        player.turn_left(dt)
+    if controls.right:
+        player.turn_right(dt)
 
 
 def get_control_hint() -> str:
@@ -0,0 +1,100 @@
+import numpy as np
+
+from wall_segments import WallSegments
+
+
+class DistanceField:
+    """
+    Distance to the nearest wall, sampled on a regular raster in world coordinates.
+    Sample (row, column) lies at (column * resolution, row * resolution).
+    Distances saturate at max_distance.
+    """
+    def __init__(self, field: np.ndarray, resolution: float, max_distance: float):
+        self.field = field
+        self.resolution = resolution
+        self.max_distance = max_distance
+
+    @staticmethod
+    def build(segments: WallSegments, screen_dimensions: (int, int), resolution: float, max_distance: float) -> 'DistanceField':
+        """
+        Rasterize the wall segments and compute their Euclidean distance transform.
+        Walls are rasterized as horizontal and vertical runs of samples, so the closest
+        wall sample to any sample lies in the same column, in the same row or at the end
+        of a run. The first two are found with cumulative passes along columns and rows,
+        the run ends by a pass over only the columns holding one, each within max_distance.
+        For a given maze the cost is linear in the number of samples.
+
+        Walls are rounded to the nearest sample and distances interpolated between samples,
+        so a sampled distance can be off from the true one by about resolution in either direction.
+
+        :param segments: axis-aligned walls, as produced by WallSegments.from_walls
+        :param screen_dimensions: width and height of the area covered by the field
+        :param resolution: world units between two samples
+        :param max_distance: distances beyond are stored as max_distance
+        """
+        columns = int(screen_dimensions[0] / resolution) + 1
+        rows = int(screen_dimensions[1] / resolution) + 1
+        walls = np.zeros((rows, columns), dtype=bool)
+        run_ends = np.zeros((rows, columns), dtype=bool)
+
+        for x0, y0, x1, y1 in zip(
+            *(np.rint(coordinates / resolution).astype(np.int64)
+              for coordinates in (segments.x0, segments.y0, segments.x1, segments.y1))
+        ):
+            x0, x1 = min(x0, columns - 1), min(x1, columns - 1)
+            y0, y1 = min(y0, rows - 1), min(y1, rows - 1)
+            walls[y0:y1 + 1, x0:x1 + 1] = True
+            run_ends[y0, x0] = run_ends[y1, x1] = True
+
+        max_offset = int(np.ceil(max_distance / resolution))
+        vertical = distance_along_columns(walls, max_offset + 1)
+        horizontal = distance_along_columns(np.ascontiguousarray(walls.T), max_offset + 1).T
+        squared = np.minimum(vertical, horizontal).astype(np.float32) ** 2
+
+        """squared distance to the closest run end, column by column of run ends"""
+        run_end_columns = np.flatnonzero(run_ends.any(axis=0))
+        to_run_end = distance_along_columns(run_ends[:, run_end_columns], max_offset + 1).astype(np.float32) ** 2
+        for i, column in enumerate(run_end_columns):
+            start = max(column - max_offset, 0)
+            stop = min(column + max_offset, columns - 1) + 1
+            offsets_squared = (np.arange(start, stop, dtype=np.float32) - column) ** 2
+            np.minimum(
+                squared[:, start:stop],
+                to_run_end[:, i, None] + offsets_squared,
+                out=squared[:, start:stop]
+            )
+
+        field = np.minimum(np.sqrt(squared) * resolution, max_distance).astype(np.float32)
+        return DistanceField(field, resolution, max_distance)
+
+    def sample_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly interpolated distance to the nearest wall at the given world positions
+        """
+        rows, columns = self.field.shape
+        fx = np.clip(np.asarray(xs, dtype=np.float64) / self.resolution, 0, columns - 1)
+        fy = np.clip(np.asarray(ys, dtype=np.float64) / self.resolution, 0, rows - 1)
+        x0 = np.minimum(fx.astype(np.int64), columns - 2)
+        y0 = np.minimum(fy.astype(np.int64), rows - 2)
+        tx = fx - x0
+        ty = fy - y0
+
+        top = self.field[y0, x0] * (1 - tx) + self.field[y0, x0 + 1] * tx
+        bottom = self.field[y0 + 1, x0] * (1 - tx) + self.field[y0 + 1, x0 + 1] * tx
+        return top * (1 - ty) + bottom * ty
+
+    def sample(self, x: float, y: float) -> float:
+        return float(self.sample_many(np.array([x]), np.array([y]))[0])
+
+
+def distance_along_columns(samples: np.ndarray, limit: int) -> np.ndarray:
+    """
+    :param samples: boolean array of shape (rows, columns)
+    :param limit: distances beyond are returned as limit
+    :return: int32 distance in samples from every sample to the closest True sample of the same column
+    """
+    rows = samples.shape[0]
+    row_indices = np.arange(rows, dtype=np.int32)[:, None]
+    above = np.maximum.accumulate(np.where(samples, row_indices, np.int32(-limit - 1)), axis=0)
+    below = np.minimum.accumulate(np.where(samples[::-1], row_indices[::-1], np.int32(rows + limit)), axis=0)[::-1]
+    return np.minimum(np.minimum(row_indices - above, below - row_indices), limit)
@@ -0,0 +1,286 @@
+import enum
+from dataclasses import dataclass
+
+from audio_handler import AudioHandler
+from controls import Controls, apply_controls
+from level import Geometry, Level, Obstacle
+from level_io import LevelCache
+from maze import MazeAlgorithm
+from math_utils import *
+from player import Direction, Player, interpolate_pose
+from profiler import FrameProfiler
+
+
+class GameStatus(enum.Enum):
+    Running = 1
+    Won = 2
+    Lost = 3
+
+
+@dataclass
+class StepResult:
+    """state of the simulation after one step"""
+    position: Position
+    direction: Angle
+    """volumes of the left, center and right channel"""
+    volumes: (float, float, float)
+    target_volume: float
+    target_panning: float
+    status: GameStatus
+
+
+class Engine:
+    """
+    The game without window, clock or audio device. Can be stepped as fast as
+    the CPU allows; an AudioHandler can be attached to play the cues.
+    """
+    DEFAULT_DT = Player.TICK_MS
+    DEFAULT_SCREEN_DIMENSIONS = (1200, 800)
+    """advance runs at most this many steps at once, dropping the time beyond"""
+    MAX_STEPS_PER_ADVANCE = 8
+
+    def __init__(
+        self,
+        screen_dimensions: (int, int) = DEFAULT_SCREEN_DIMENSIONS,
+        maze_dimensions: (int, int) = Level.DEFAULT_MAZE_DIMENSIONS,
+        geometry=Geometry.Points,
+        audio_handler: AudioHandler = None,
+        profiler: FrameProfiler = None,
+        level_cache: LevelCache = None,
+        distance_field_resolution=None,
+        tick_ms=DEFAULT_DT,
+        maze_algorithm=MazeAlgorithm.DFS
+    ):
+        """
+        :param tick_ms: milliseconds simulated by every step of advance
+        :param maze_algorithm: how the mazes of reset are carved
+        :param level_cache: if given, seeded levels are loaded from and saved to this cache
+        :param distance_field_resolution: if given, levels get a distance field of this
+            resolution and collisions are looked up in it instead of computed from the scan
+        """
+        self.screen_dimensions = screen_dimensions
+        self.maze_dimensions = maze_dimensions
+        self.geometry = geometry
+        self.audio_handler = audio_handler
+        self.level_cache = level_cache
+        self.distance_field_resolution = distance_field_resolution
+        self.tick_ms = tick_ms
+        self.maze_algorithm = maze_algorithm
+        """if set, gets the controls of every step, see replay.InputRecorder"""
+        self.recorder = None
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+
+        self.level: Level = None
+        self.player: Player = None
+        self.status = GameStatus.Running
+        self.elapsed_time = 0
+        self.adjust_audio_timer = 0
+        """milliseconds passed but not simulated yet, see advance"""
+        self.accumulator = 0
+        self.previous_position: Position = None
+        self.previous_direction: Angle = None
+        self.volumes = (0.0, 0.0, 0.0)
+        self.target_volume = 0.0
+        self.target_panning = Player.DIRECTION_TO_PANNING[Direction.Center]
+
+    def reset(self, seed=None) -> StepResult:
+        """
+        Start a new session on a freshly generated level
+
+        :param seed: seed of the maze generation, random if None
+        :return: the initial state
+        """
+        return self.start(self.build_level(seed))
+
+    def build_level(self, seed=None) -> Level:
+        """
+        Generate a level with the engine's settings, without starting it.
+        Touches no state of the engine, so it can run on another thread, see progression.py
+
+        :param seed: seed of the maze generation, random if None
+        """
+        if self.level_cache is not None and seed is not None:
+            return self.level_cache.get(
+                seed, *self.maze_dimensions,
+                self.screen_dimensions, Obstacle.DEFAULT_RADIUS, self.geometry,
+                self.distance_field_resolution,
+                self.maze_algorithm
+            )
+
+        level = Level(*self.maze_dimensions, seed=seed, algorithm=self.maze_algorithm)
+        level.generate_objects(
+            *self.screen_dimensions,
+            Obstacle.DEFAULT_RADIUS,
+            self.geometry,
+            self.distance_field_resolution
+        )
+        return level
+
+    def start(self, level) -> StepResult:
+        """
+        Start a new session on the given level
+
+        :param level: a Level with generated objects, or any level offering the same
+            scanning interface like chunked_world.ChunkedLevel
+        :return: the initial state
+        """
+        self.level = level
+        self.player = Player(
+            Position(*self.level.start_position),
+            Angle(np.pi / 2),
+            self.level.screen_dimensions,
+            self.level.viewing_bounds
+        )
+
+        self.status = GameStatus.Running
+        self.elapsed_time = 0
+        self.adjust_audio_timer = 0
+        self.accumulator = 0
+        self.previous_position = Position(self.player.position)
+        self.previous_direction = Angle(self.player.direction.rad)
+        self.volumes = (0.0, 0.0, 0.0)
+        self.target_volume = 0.0
+        self.target_panning = Player.DIRECTION_TO_PANNING[Direction.Center]
+        return self.result()
+
+    def step(self, controls: Controls, dt=DEFAULT_DT) -> StepResult:
+        """
+        Advance the simulation by one frame: scan the surroundings, then apply the controls
+
+        :param controls: controls held during this frame
+        :param dt: duration of the frame in milliseconds
+        :return: the state after the frame
+        """
+        if self.status != GameStatus.Running:
+            return self.result()
+        if self.recorder is not None:
+            self.recorder.record(controls)
+
+        self.previous_position = Position(self.player.position)
+        self.previous_direction = Angle(self.player.direction.rad)
+        self.elapsed_time += dt
+        self.adjust_audio_timer += dt
+
+        with self.profiler.phase('scan_surroundings'):
+            if self.adjust_audio_timer >= AudioHandler.ADJUST_AUDIO_TIMEOUT:
+                self.scan_surroundings(True)
+                self.adjust_audio_timer = 0
+            else:
+                self.scan_surroundings(False)
+
+        if self.status == GameStatus.Running:
+            with self.profiler.phase('handle_player_controls'):
+                apply_controls(self.player, controls, dt)
+        return self.result()
+
+    def advance(self, controls: Controls, frame_time: float) -> StepResult:
+        """
+        Simulate the time passed since the last call in fixed steps of tick_ms,
+        independent of how long rendering the frame took. The remainder is
+        carried over to the next call.
+
+        :param controls: controls held since the last call
+        :param frame_time: milliseconds passed since the last call
+        :return: the state after the last step
+        """
+        self.accumulator = min(self.accumulator + frame_time, self.tick_ms * Engine.MAX_STEPS_PER_ADVANCE)
+        while self.accumulator >= self.tick_ms:
+            self.step(controls, self.tick_ms)
+            self.accumulator -= self.tick_ms
+            self.profiler.count('simulation_steps')
+        return self.result()
+
+    def interpolated_player(self) -> Player:
+        """
+        :return: the player between its previous and its current pose, by how far
+            the time not simulated yet reaches into the next step, for rendering
+        """
+        alpha = min(self.accumulator / self.tick_ms, 1)
+        position, direction = interpolate_pose(
+            self.previous_position, self.previous_direction,
+            self.player.position, self.player.direction,
+            alpha
+        )
+        return Player(position, direction, self.screen_dimensions, self.player.viewing_sector)
+
+    def result(self) -> StepResult:
+        return StepResult(
+            Position(self.player.position),
+            Angle(self.player.direction.rad),
+            self.volumes,
+            self.target_volume,
+            self.target_panning,
+            self.status
+        )
+
+    def scan_surroundings(self, adjust_audio):
+        radius = self.player.viewing_sector.radius
+        scan = self.level.scan_obstacles(self.player)
+        self.profiler.count('obstacles_tested', scan.tested)
+
+        """if the player collides with an obstacle, the game ends"""
+        if self.level.distance_field is not None:
+            collided = self.level.collides(self.player.position)
+        else:
+            collided = scan.collided
+        if collided:
+            self.end(GameStatus.Lost)
+            return
+
+        """if the player reaches the target, the game ends"""
+        dist_to_target = self.player.distance_to(self.level.target)
+        if dist_to_target < Level.TARGET_RADIUS + Player.BODY_RADIUS:
+            self.end(GameStatus.Won)
+            return
+
+        if adjust_audio:
+            """adjust the volume according to the closest obstacle per direction"""
+            self.volumes = (
+                AudioHandler.distance_to_volume(scan.closest_left, radius),
+                AudioHandler.distance_to_volume(scan.closest_center, radius),
+                AudioHandler.distance_to_volume(scan.closest_right, radius)
+            )
+
+            """the target makes a sound, if the player is facing towards it"""
+            target_polar_coordinate = self.player.world_position_to_relative_polar_coordinate(self.level.target)
+            if self.player.is_facing(target_polar_coordinate):
+                target_direction = self.player.direction_relative_to_player(target_polar_coordinate)
+                self.target_panning = Player.DIRECTION_TO_PANNING[target_direction]
+                self.target_volume = AudioHandler.distance_to_volume(dist_to_target, self.screen_dimensions[0])
+            else:
+                self.target_volume = 0.0
+
+            if self.audio_handler is None:
+                return
+            if self.audio_handler.spatial_mixer is not None:
+                with self.profiler.phase('audio'):
+                    self.update_spatial_audio(target_polar_coordinate)
+                return
+            with self.profiler.phase('audio'):
+                self.audio_handler.set_volume(*self.volumes)
+                self.audio_handler.set_target_panning(self.target_panning)
+                self.audio_handler.set_target_volume(self.target_volume)
+            self.profiler.count('audio_updates', 3)
+
+    def update_spatial_audio(self, target_polar_coordinate: PolarCoordinate):
+        """position one source per wall in sight and the target in the spatial mixer"""
+        keys, rads, distances = self.level.sources_in_sight(self.player)
+        direction = self.player.direction.rad
+        self.audio_handler.set_spatial_sources(
+            keys,
+            (rads - direction + np.pi) % (2 * np.pi) - np.pi,
+            AudioHandler.distances_to_volumes(distances, self.player.viewing_sector.radius),
+            (target_polar_coordinate.angle.rad - direction + np.pi) % (2 * np.pi) - np.pi,
+            self.target_volume
+        )
+        self.profiler.count('audio_updates', len(keys) + 1)
+
+    def end(self, status: GameStatus):
+        self.status = status
+        if self.audio_handler is None:
+            return
+
+        if status == GameStatus.Won:
+            self.audio_handler.play_completion_sound()
+        else:
+            self.audio_handler.play_game_over_sound()
@@ -0,0 +1,132 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List
+import numpy as np
+
+from autopilot import autopilot_controller
+from controls import Controls
+from engine import Engine, GameStatus, StepResult
+from level import Geometry, Level
+from maze import MazeAlgorithm
+
+
+@dataclass
+class EpisodeResult:
+    seed: int
+    status: GameStatus
+    steps: int
+    """simulated time in milliseconds"""
+    elapsed_time: float
+    """wall clock time in seconds, including level generation"""
+    wall_time: float
+
+
+class RandomWalkController:
+    """bot that mostly moves forward and turns at random, reproducible by seed"""
+    TURN_PROBABILITY = 0.3
+
+    def __init__(self, seed: int, level: Level = None):
+        self.random = random.Random(seed)
+
+    def __call__(self, state: StepResult) -> Controls:
+        turn = self.random.random()
+        return Controls(
+            forward=True,
+            left=turn < RandomWalkController.TURN_PROBABILITY / 2,
+            right=RandomWalkController.TURN_PROBABILITY / 2 <= turn < RandomWalkController.TURN_PROBABILITY
+        )
+
+
+def episode_seeds(base_seed: int, count: int) -> List[int]:
+    """
+    Derive independent seeds for a number of episodes
+
+    :param base_seed: seed of the whole run
+    :param count: number of episodes
+    :return: one seed per episode
+    """
+    children = np.random.SeedSequence(base_seed).spawn(count)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def run_episode(
+    seed: int,
+    maze_dimensions: (int, int) = Level.DEFAULT_MAZE_DIMENSIONS,
+    controller_factory: Callable[[int, Level], Callable[[StepResult], Controls]] = RandomWalkController,
+    max_steps: int = 10000,
+    geometry=Geometry.Points,
+    screen_dimensions: (int, int) = Engine.DEFAULT_SCREEN_DIMENSIONS,
+    maze_algorithm=MazeAlgorithm.DFS
+) -> EpisodeResult:
+    """
+    Generate a level and play it headless until the game ends or max_steps is reached
+
+    :param seed: seed of both the maze and the controller
+    :param controller_factory: creates the controller from the seed and the level, must be picklable
+    """
+    start = time.perf_counter()
+    engine = Engine(screen_dimensions, maze_dimensions, geometry, maze_algorithm=maze_algorithm)
+    state = engine.reset(seed)
+    controller = controller_factory(seed, engine.level)
+
+    steps = 0
+    while state.status == GameStatus.Running and steps < max_steps:
+        state = engine.step(controller(state))
+        steps += 1
+
+    return EpisodeResult(seed, state.status, steps, engine.elapsed_time, time.perf_counter() - start)
+
+
+def run_episodes(
+    seeds: Iterable[int],
+    workers: int = None,
+    **episode_kwargs
+) -> Iterator[EpisodeResult]:
+    """
+    Run episodes on a process pool, yielding each result as soon as it completes.
+    Every episode only depends on its own seed, so results do not depend on the number of workers.
+
+    :param seeds: one seed per episode
+    :param workers: number of processes, all cores if None
+    :param episode_kwargs: passed on to run_episode
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_episode, seed, **episode_kwargs) for seed in seeds]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run headless episodes in parallel')
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--maze', type=int, nargs=2, default=Level.DEFAULT_MAZE_DIMENSIONS)
+    parser.add_argument('--screen', type=int, nargs=2, default=Engine.DEFAULT_SCREEN_DIMENSIONS)
+    parser.add_argument('--max-steps', type=int, default=10000)
+    parser.add_argument('--algorithm', choices=[algorithm.name for algorithm in MazeAlgorithm], default='DFS')
+    parser.add_argument('--autopilot', action='store_true', help='follow the shortest route instead of walking at random')
+    args = parser.parse_args()
+
+    won = 0
+    results = run_episodes(
+        episode_seeds(args.seed, args.episodes),
+        workers=args.workers,
+        maze_dimensions=tuple(args.maze),
+        screen_dimensions=tuple(args.screen),
+        max_steps=args.max_steps,
+        maze_algorithm=MazeAlgorithm[args.algorithm],
+        controller_factory=autopilot_controller if args.autopilot else RandomWalkController
+    )
+    for result in results:
+        won += result.status == GameStatus.Won
+        print(f'{result.seed}: {result.status.name} after {result.steps} steps ({result.wall_time:.3f}s)')
+
+    print(f'solved {won}/{args.episodes}')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,123 @@
+import os
+import random
 import pygame.draw
 import controls
 from audio_handler import AudioHandler
-from controls import handle_player_controls
-from level import Level, Obstacle
-from math_utils import *
-from player import Player, Direction
+from chunked_world import ChunkedLevel
+from controls import read_controls
+from engine import Engine, GameStatus
+from level import Geometry, Level
+from maze import MazeAlgorithm
+from player import Player
+from profiler import FrameProfiler
+from progression import LevelProgression
+from renderer import CameraRenderer, DirtyRectRenderer, draw_objects, draw_player
+from replay import InputRecorder
 
 
 class Game:
     SCREEN_WIDTH = 1200
     SCREEN_HEIGHT = 800
     BACKGROUND_COLOR = 'black'
-    FPS = 60
+    """upper bound of the render rate, the simulation runs at SIMULATION_TICK_MS regardless"""
+    FPS = 144
+    SIMULATION_TICK_MS = 1000 / 60
     TEXT_FONT = ('Mono', 20)
     STARTING_POS_COLOR = 'red'
-
-    def __init__(self):
+    WALL_GEOMETRY = Geometry.Points
+    MAZE_ALGORITHM = MazeAlgorithm.DFS
+    DIRTY_RECT_RENDERING = True
+    """play an unbounded maze generated chunk by chunk instead of one fitting the screen"""
+    CHUNKED_WORLD = False
+    """hear every wall in sight as a source of its own instead of three tones for left, center and right"""
+    SPATIAL_AUDIO = False
+    """world units between the samples of the distance field used for collisions"""
+    DISTANCE_FIELD_RESOLUTION = 4
+    TRACE_FILE = 'trace.json'
+    """seconds between printed profiler summaries"""
+    SUMMARY_INTERVAL = 5
+
+    def __init__(self, profiler: FrameProfiler = None, recording_path: str = None):
+        """
+        :param profiler: times the phases of every frame if enabled, see FrameProfiler
+        :param recording_path: if given, every level played is recorded, the first one to this
+            file and the following ones next to it, see recording_path_of and replay.py
+        """
+        self.profiler = profiler if profiler is not None else FrameProfiler()
         self.screen = pygame.display.set_mode((Game.SCREEN_WIDTH, Game.SCREEN_HEIGHT))
         pygame.display.set_caption('Headphones Recommended')
         pygame.font.init()
         font = pygame.font.SysFont(*Game.TEXT_FONT)
         self.text = font.render(controls.get_control_hint(), True, 'white')
-        self.audio_handler = AudioHandler()
-
-        self.level = Level()
-        self.level.generate_objects(
-            Game.SCREEN_WIDTH,
-            Game.SCREEN_HEIGHT,
-            Obstacle.DEFAULT_RADIUS
+        self.audio_handler = AudioHandler(presynthesize=True, spatial=Game.SPATIAL_AUDIO)
+
+        self.engine = Engine(
+            (Game.SCREEN_WIDTH, Game.SCREEN_HEIGHT),
+            geometry=Game.WALL_GEOMETRY,
+            audio_handler=self.audio_handler,
+            profiler=self.profiler,
+            distance_field_resolution=Game.DISTANCE_FIELD_RESOLUTION,
+            tick_ms=Game.SIMULATION_TICK_MS,
+            maze_algorithm=Game.MAZE_ALGORITHM
         )
-
-        self.player = Player(
-            Position(*self.level.start_position),
-            Angle(np.pi / 2),
-            (Game.SCREEN_WIDTH, Game.SCREEN_HEIGHT)
+        """every session is seeded, so that its levels can be recorded and replayed"""
+        self.progression = LevelProgression(
+            self.engine,
+            random.randrange(2 ** 32),
+            ChunkedLevel if Game.CHUNKED_WORLD else None
         )
-
-        self.starting_pos = self.player.position
+        self.progression.start()
+        self.recording_path = recording_path
+        """number of levels played so far, counting every attempt"""
+        self.attempts = 0
+        self.begin_level()
         self.running = True
         self.loop()
 
-    def draw_text(self):
-        self.screen.blit(self.text, (20, 20))
+    def begin_level(self):
+        """set up recording and rendering for the level the engine has just started"""
+        if self.recording_path is not None:
+            self.engine.recorder = InputRecorder(self.engine, self.progression.level_seed)
+
+        self.starting_pos = self.player.position
+        if Game.CHUNKED_WORLD:
+            self.renderer = CameraRenderer(self.screen, self.level, self.text, Game.BACKGROUND_COLOR)
+        elif Game.DIRTY_RECT_RENDERING:
+            self.renderer = DirtyRectRenderer(
+                self.screen,
+                self.level,
+                self.starting_pos,
+                self.text,
+                Game.BACKGROUND_COLOR,
+                Game.STARTING_POS_COLOR
+            )
+        else:
+            self.renderer = None
+
+    @property
+    def level(self) -> Level:
+        return self.engine.level
+
+    @property
+    def player(self) -> Player:
+        return self.engine.player
+
+    def redraw(self, player: Player = None):
+        """
+        :param player: pose to draw the player in, the current one if None
+        """
+        player = player if player is not None else self.player
+        if self.renderer is not None:
+            self.renderer.render(player)
+            return
 
-    def redraw(self):
         self.screen.fill(Game.BACKGROUND_COLOR)
         self.draw_starting_position()
-        self.draw_player()
-        self.draw_objects()
-        self.draw_text()
+        draw_player(self.screen, player)
+        draw_objects(self.screen, self.level)
+        self.screen.blit(self.text, (20, 20))
         pygame.display.flip()
 
-    def draw_player(self):
-        frustum_radius = Player.VIEWING_BOUNDS.radius
-        offset_angle = Player.VIEWING_BOUNDS.angle
-        arc_start = self.player.direction - offset_angle
-
-        pygame.draw.circle(
-            self.screen,
-            Player.COLOR,
-            self.player.position,
-            Player.BODY_RADIUS
-        )
-
-        pygame.draw.arc(
-            self.screen,
-            Player.FRUSTUM_COLOR,
-            (
-                self.player.position.x - frustum_radius,
-                self.player.position.y - frustum_radius,
-                2 * frustum_radius,
-                2 * frustum_radius
-            ),
-            arc_start.rad, (arc_start + offset_angle * 2).rad,
-            1
-        )
-
-        arc_start_coordinate = PolarCoordinate(arc_start, frustum_radius)
-        arc_end_coordinate = PolarCoordinate(arc_start + offset_angle * 2, frustum_radius)
-        arc_start_world_coordinate = self.player.relative_polar_coordinate_to_world_position(arc_start_coordinate)
-        arc_end_world_coordinate = self.player.relative_polar_coordinate_to_world_position(arc_end_coordinate)
-
-        pygame.draw.line(
-            self.screen,
-            Player.FRUSTUM_COLOR,
-            (self.player.position.x, self.player.position.y),
-            (arc_start_world_coordinate.x, arc_start_world_coordinate.y)
-        )
-
-        pygame.draw.line(
-            self.screen,
-            Player.FRUSTUM_COLOR,
-            (self.player.position.x, self.player.position.y),
-            (arc_end_world_coordinate.x, arc_end_world_coordinate.y)
-        )
-
     def draw_starting_position(self):
         pygame.draw.circle(
             self.screen,
@@ -103,103 +126,65 @@ class Game:
             Player.BODY_RADIUS
         )
 
-    def draw_objects(self):
-        for o in self.level.obstacles:
-            pygame.draw.circle(
-                self.screen,
-                o.color,
-                o.position,
-                Obstacle.DEFAULT_RADIUS
-            )
-
-        pygame.draw.circle(
-            self.screen,
-            Level.TARGET_COLOR,
-            self.level.target,
-            Level.TARGET_RADIUS
-        )
-
-    def scan_surroundings(self, adjust_audio):
-        radius = Player.VIEWING_BOUNDS.radius
-        closest_right_obstacle_dist = radius + 1
-        closest_center_obstacle_dist = radius + 1
-        closest_left_obstacle_dist = radius + 1
-
-        for o in self.level.obstacles:
-            relative_polar_coordinate = self.player.world_position_to_relative_polar_coordinate(o.position)
-            if self.player.can_see(relative_polar_coordinate):
-                o.color = Obstacle.DEFAULT_COLOR_IN_SIGHT
-
-                """if the player collides with an obstacle, the game ends"""
-                if self.player.distance_to(o.position) <= Player.BODY_RADIUS:
-                    self.audio_handler.play_game_over_sound()
-                    self.running = False
-                    return
-
-                obstacle_direction = self.player.direction_relative_to_player(relative_polar_coordinate)
-                distance = self.player.distance_to(o.position)
-
-                """adjust the volume according to the closest obstacle per direction"""
-                if adjust_audio:
-                    if obstacle_direction == Direction.Left:
-                        if distance < closest_left_obstacle_dist:
-                            closest_left_obstacle_dist = distance
-                    elif obstacle_direction == Direction.Center:
-                        if distance < closest_center_obstacle_dist:
-                            closest_center_obstacle_dist = distance
-                    else:
-                        if distance < closest_right_obstacle_dist:
-                            closest_right_obstacle_dist = distance
-            else:
-                o.color = Obstacle.DEFAULT_COLOR
-
-        """if the player reaches the target, the game ends"""
-        dist_to_target = self.player.distance_to(self.level.target)
-        if dist_to_target < Level.TARGET_RADIUS + Player.BODY_RADIUS:
-            self.audio_handler.play_completion_sound()
-            self.running = False
-            return
-
-        if adjust_audio:
-            self.audio_handler.set_volume(
-                AudioHandler.distance_to_volume(closest_left_obstacle_dist, radius),
-                AudioHandler.distance_to_volume(closest_center_obstacle_dist, radius),
-                AudioHandler.distance_to_volume(closest_right_obstacle_dist, radius)
-            )
-
-            """the target makes a sound, if the player is facing towards it"""
-            target_polar_coordinate = self.player.world_position_to_relative_polar_coordinate(self.level.target)
-            if self.player.is_facing(target_polar_coordinate):
-                target_direction = self.player.direction_relative_to_player(target_polar_coordinate)
-                target_panning = Player.DIRECTION_TO_PANNING[target_direction]
-                self.audio_handler.set_target_panning(target_panning)
-                self.audio_handler.set_target_volume(
-                    AudioHandler.distance_to_volume(dist_to_target, Game.SCREEN_WIDTH)
-                )
-            else:
-                self.audio_handler.set_target_volume(0.0)
-
     def loop(self):
         clock = pygame.time.Clock()
-        adjust_audio_timer = 0
+        summary_timer = 0
 
         while self.running:
-            adjust_audio_timer += clock.tick(Game.FPS)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-
-            if adjust_audio_timer >= AudioHandler.ADJUST_AUDIO_TIMEOUT:
-                self.scan_surroundings(True)
-                adjust_audio_timer = 0
-            else:
-                self.scan_surroundings(False)
-            handle_player_controls(self.player)
-
-            self.redraw()
-
-        while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
+            frame_time = clock.tick(Game.FPS)
+            self.profiler.begin_frame()
+
+            with self.profiler.phase('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        self.running = False
+                    self.audio_handler.handle_event(event)
+
+            with self.profiler.phase('simulation'):
+                result = self.engine.advance(read_controls(), frame_time)
+            """keep drawing while the completion or game over sound is playing, then go on"""
+            if result.status != GameStatus.Running and not self.audio_handler.is_playing_clip():
+                with self.profiler.phase('next_level'):
+                    self.save_recording()
+                    self.progression.next(result.status)
+                    self.begin_level()
+
+            with self.profiler.phase('redraw'):
+                self.redraw(self.engine.interpolated_player())
+            self.profiler.end_frame()
+
+            summary_timer += frame_time
+            if self.profiler.enabled and summary_timer >= Game.SUMMARY_INTERVAL * 1000:
+                print(self.profiler.format_summary())
+                summary_timer = 0
+
+        self.export_profile()
+        self.save_recording()
+        self.progression.close()
+        self.audio_handler.close()
+        pygame.quit()
+
+    def recording_path_of(self, attempt: int) -> str:
+        """
+        :param attempt: number of levels played before, counting every attempt
+        :return: file the attempt is recorded to, e.g. session.rec, session.1.rec, session.2.rec
+        """
+        if attempt == 0:
+            return self.recording_path
+        root, extension = os.path.splitext(self.recording_path)
+        return f'{root}.{attempt}{extension}'
+
+    def save_recording(self):
+        """save the recording of the current level, if any"""
+        if self.engine.recorder is not None:
+            path = self.recording_path_of(self.attempts)
+            self.engine.recorder.save(path)
+            print(f'recorded {len(self.engine.recorder.controls)} steps to {path}')
+            self.engine.recorder = None
+        self.attempts += 1
+
+    def export_profile(self):
+        if self.profiler.enabled:
+            self.profiler.export_trace(Game.TRACE_FILE)
+            print(self.profiler.format_summary())
+            print(self.audio_handler.assets.format_load_times())
@@ -1,8 +1,14 @@
+import enum
 import random
-from dataclasses import dataclass
-from typing import List
-from math_utils import Position
-from random import shuffle
+from dataclasses import dataclass, replace
+import numpy as np
+from math_utils import PolarCoordinate, Position
+from maze import STEP_OFFSETS, WALL_LEFT, WALL_UP, MazeAlgorithm, carve_maze, flow_field
+from obstacle_store import IncrementalScanner, ObstacleStore, ScanResult
+from ray_caster import RayScanner
+from spatial_index import SpatialHash
+from wall_segments import WallSegments
+from distance_field import DistanceField
 from player import Player
 
 
@@ -17,6 +23,12 @@ class Obstacle:
         self.color = color
 
 
+class Geometry(enum.Enum):
+    """how walls are represented: rows of point obstacles or merged line segments"""
+    Points = 1
+    Segments = 2
+
+
 @dataclass
 class Cell:
     def __init__(self, wall_up=True, wall_left=True):
@@ -29,169 +41,303 @@ class Level:
     DEFAULT_MAZE_DIMENSIONS = (4, 4)
     TARGET_COLOR = 'gold'
     TARGET_RADIUS = 30
-
-    def __init__(self, width=DEFAULT_MAZE_DIMENSIONS[0], height=DEFAULT_MAZE_DIMENSIONS[1]):
+    """
+    reuse the previous scan while the pose is unchanged, and scan point obstacles with
+    an IncrementalScanner otherwise; segments and ray casting only reuse unchanged poses
+    """
+    INCREMENTAL_SCAN = True
+    """sense the walls by casting RAY_COUNT rays through the maze grid instead of scanning the obstacles"""
+    RAY_CAST_SCAN = False
+    RAY_COUNT = 30
+
+    def __init__(
+        self,
+        width=DEFAULT_MAZE_DIMENSIONS[0], height=DEFAULT_MAZE_DIMENSIONS[1],
+        seed=None,
+        generate=True,
+        algorithm=MazeAlgorithm.DFS
+    ):
+        """
+        :param seed: seed of the maze generation, random if None
+        :param generate: if False, the maze is left empty to be filled in, e.g. by level_io.load_level
+        :param algorithm: how the maze is carved, see maze.GENERATORS
+        """
         self.width = width
         self.height = height
-        self.grid: List[List[Cell]] = []
-        self.obstacles: List[Obstacle] = []
+        self.seed = seed
+        self.algorithm = algorithm
+        self.random = random.Random(seed)
+        """WALL_UP and WALL_LEFT bits per cell, indexed by [x, y]"""
+        self.walls = np.full((width, height), WALL_UP | WALL_LEFT, dtype=np.uint8)
+        self.obstacle_store = ObstacleStore([], [])
+        self.spatial_index: SpatialHash = None
+        self.geometry = Geometry.Points
+        self.wall_segments = WallSegments([], [], [], [])
+        self.distance_field: DistanceField = None
         self.start_position = None
         self.target = None
+        """cells of start and target, kept when start_position and target become world coordinates"""
+        self.start_cell = None
+        self.target_cell = None
+        """
+        moves from every cell to the target cell and the first move of that route, see maze.flow_field.
+        None until compute_flow_field is called, e.g. by route_step.
+        """
+        self.distance_to_target: np.ndarray = None
+        self.next_step: np.ndarray = None
+        self.screen_dimensions = None
+        """half the viewing angle and the viewing radius of players in this level, see place_in_screen"""
+        self.viewing_bounds: PolarCoordinate = None
+        self.obstacle_radius = None
+        self.cell_width = None
+        self.cell_height = None
+        self.incremental_scanner: IncrementalScanner = None
+        self.ray_scanner: RayScanner = None
+        """frustum and result of the last scan, see scan_obstacles"""
+        self.last_scanned_frustum = None
+        self.last_scan: ScanResult = None
+
+        if generate:
+            self.generate_maze()
+
+    def generate_objects(
+        self,
+        screen_width, screen_height,
+        obstacle_radius,
+        geometry=Geometry.Points,
+        distance_field_resolution=None
+    ):
+        """
+        :param distance_field_resolution: world units between the samples of the
+            distance field, no distance field is built if None
+        """
+        self.place_in_screen(screen_width, screen_height, obstacle_radius, geometry)
+
+        if geometry == Geometry.Segments:
+            self.wall_segments = WallSegments.from_walls(
+                *self.wall_arrays(),
+                self.cell_width, self.cell_height
+            )
+            self.wall_segments.build_index(self.cell_width, self.cell_height)
+            self.obstacle_store = ObstacleStore([], [])
+        else:
+            self.obstacle_store = ObstacleStore(*self.generate_point_obstacles(
+                screen_width, screen_height,
+                self.cell_width, self.cell_height,
+                obstacle_radius
+            ))
+
+        self.spatial_index = SpatialHash.build(
+            self.cell_width, self.cell_height,
+            self.obstacle_store.x, self.obstacle_store.y
+        )
 
-        for i in range(width):
-            self.grid.append([])
-            for j in range(height):
-                self.grid[i].append(Cell())
-
-        self.generate_maze()
-
-    def generate_objects(self, screen_width, screen_height, obstacle_radius):
-        cell_width = screen_width / self.width
-        cell_height = screen_height / self.height
-        Player.VIEWING_BOUNDS.radius *= min(cell_width, cell_height)
-
-        obstacles_per_horizontal_wall = int(cell_width / obstacle_radius)
-        obstacles_per_vertical_wall = int(cell_height / obstacle_radius)
+        if distance_field_resolution is not None:
+            self.distance_field = DistanceField.build(
+                WallSegments.from_walls(*self.wall_arrays(), self.cell_width, self.cell_height),
+                self.screen_dimensions,
+                distance_field_resolution,
+                self.viewing_bounds.radius
+            )
+
+    def place_in_screen(self, screen_width, screen_height, obstacle_radius, geometry=Geometry.Points):
+        """
+        Scale the maze to the screen: compute the cell size, the viewing radius
+        and the world coordinates of start and target
+        """
+        self.geometry = geometry
+        self.screen_dimensions = (screen_width, screen_height)
+        self.obstacle_radius = obstacle_radius
+        self.cell_width = cell_width = screen_width / self.width
+        self.cell_height = cell_height = screen_height / self.height
+        self.viewing_bounds = PolarCoordinate(
+            Player.VIEWING_BOUNDS.angle,
+            Player.VIEWING_RADIUS_IN_CELLS * min(cell_width, cell_height)
+        )
 
         self.start_position = (
-            cell_width * (self.start_position[0] + 0.5),
-            cell_height * (self.start_position[1] + 0.5)
+            cell_width * (self.start_cell[0] + 0.5),
+            cell_height * (self.start_cell[1] + 0.5)
         )
 
         self.target = Position(
-            cell_width * (self.target[0] + 0.5),
-            cell_height * (self.target[1] + 0.5)
+            cell_width * (self.target_cell[0] + 0.5),
+            cell_height * (self.target_cell[1] + 0.5)
         )
 
-        self.generate_border_obstacles(
-            screen_width, screen_height, obstacle_radius
-        )
-
-        for i in range(self.width):
-            for j in range(self.height):
-                cell = self.grid[i][j]
-                x = cell_width * (i + 0.5)
-                y = cell_height * (j + 0.5)
-                if cell.wall_up:
-                    self.generate_wall_above(
-                        x, y,
-                        cell_width, cell_height,
-                        obstacles_per_horizontal_wall
-                    )
-                if cell.wall_left:
-                    self.generate_wall_left_of(
-                        x, y,
-                        cell_width, cell_height,
-                        obstacles_per_vertical_wall
-                    )
-
-    def generate_wall_above(
-        self,
-        x, y,
-        cell_width, cell_height,
-        obstacles_per_horizontal_wall
-    ):
-        step_size = cell_width / obstacles_per_horizontal_wall
-        wall_y = y - cell_height / 2
-        wall_x_start = x - cell_width / 2
-
-        for i in range(obstacles_per_horizontal_wall):
-            current_x = wall_x_start + i * step_size
-            self.obstacles.append(Obstacle(Position(current_x, wall_y)))
+    def scan_obstacles(self, player: Player) -> ScanResult:
+        """
+        Scan the obstacles around the player, only visiting the buckets of
+        the spatial index overlapping the player's viewing frustum.
+        With INCREMENTAL_SCAN, a scan from the same pose as the last one tests
+        no obstacle at all and returns the last result, whatever the geometry; point
+        obstacles are scanned by an IncrementalScanner otherwise. With RAY_CAST_SCAN, rays are
+        cast through the maze grid instead, see ray_caster.RayScanner.
+        """
+        frustum = player.frustum()
+        if Level.INCREMENTAL_SCAN and frustum is self.last_scanned_frustum:
+            return replace(self.last_scan, tested=0)
+
+        if Level.RAY_CAST_SCAN:
+            scan = self.get_ray_scanner().scan(player)
+        elif self.geometry == Geometry.Segments:
+            scan = self.wall_segments.scan(player)
+        elif Level.INCREMENTAL_SCAN:
+            if self.incremental_scanner is None:
+                self.incremental_scanner = IncrementalScanner(self.obstacle_store, self.spatial_index)
+            scan = self.incremental_scanner.scan(player)
+        else:
+            scan = self.obstacle_store.scan(player, self.spatial_index.sector_candidates(player))
+
+        self.last_scanned_frustum = frustum
+        self.last_scan = scan
+        return scan
+
+    def sources_in_sight(self, player: Player) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Walls in sight since the last scan, as sound sources
+
+        :return: stable key, angle and distance relative to the player per wall in sight
+        """
+        if Level.RAY_CAST_SCAN:
+            return self.get_ray_scanner().sources_in_sight(player)
+        if self.geometry == Geometry.Segments:
+            return self.wall_segments.sources_in_sight(player)
+        return self.obstacle_store.sources_in_sight(player)
+
+    def get_ray_scanner(self) -> RayScanner:
+        """the ray scanner of this level, created on first use"""
+        if self.ray_scanner is None:
+            self.ray_scanner = RayScanner(self.walls, self.cell_width, self.cell_height, Level.RAY_COUNT)
+        return self.ray_scanner
+
+    def collides(self, position: Position) -> bool:
+        """
+        Whether the player's body at position touches a wall, looked up in the distance field
+        """
+        return self.distance_field.sample(position.x, position.y) <= Player.BODY_RADIUS
+
+    def wall_arrays(self) -> (np.ndarray, np.ndarray):
+        """
+        :return: boolean arrays of shape (width, height) holding wall_up and wall_left of every cell
+        """
+        return (self.walls & WALL_UP) != 0, (self.walls & WALL_LEFT) != 0
+
+    def wall_up(self, x, y) -> bool:
+        return bool(self.walls[x, y] & WALL_UP)
+
+    def wall_left(self, x, y) -> bool:
+        return bool(self.walls[x, y] & WALL_LEFT)
+
+    def cell(self, x, y) -> Cell:
+        cell = Cell(self.wall_up(x, y), self.wall_left(x, y))
+        cell.is_visited = True
+        return cell
 
-    def generate_wall_left_of(
+    def generate_point_obstacles(
         self,
-        x, y,
+        screen_width, screen_height,
         cell_width, cell_height,
-        obstacles_per_vertical_wall
-    ):
-        step_size = cell_height / obstacles_per_vertical_wall
-        wall_x = x - cell_width / 2
-        wall_y_start = y - cell_height / 2
-
-        for i in range(obstacles_per_vertical_wall):
-            current_y = wall_y_start + i * step_size
-            self.obstacles.append(Obstacle(Position(wall_x, current_y)))
+        obstacle_radius
+    ) -> (np.ndarray, np.ndarray):
+        """
+        Line the walls with point obstacles, first the bottom and right border, then
+        cell by cell the wall above followed by the wall to the left
+
+        :return: x- and y-coordinates of the obstacles
+        """
+        obstacles_per_horizontal_wall = max(int(cell_width / obstacle_radius), 1)
+        obstacles_per_vertical_wall = max(int(cell_height / obstacle_radius), 1)
+
+        border_xs, border_ys = self.generate_border_obstacles(screen_width, screen_height, obstacle_radius)
+
+        """corner of every cell, shape (width, height, 1), and the obstacles along its walls"""
+        x = (cell_width * (np.arange(self.width) + 0.5) - cell_width / 2)[:, None, None]
+        y = (cell_height * (np.arange(self.height) + 0.5) - cell_height / 2)[None, :, None]
+        along_horizontal = np.arange(obstacles_per_horizontal_wall) * (cell_width / obstacles_per_horizontal_wall)
+        along_vertical = np.arange(obstacles_per_vertical_wall) * (cell_height / obstacles_per_vertical_wall)
+        shape = (self.width, self.height, obstacles_per_horizontal_wall + obstacles_per_vertical_wall)
+        xs = np.broadcast_to(np.concatenate([
+            np.broadcast_to(x + along_horizontal, (self.width, 1, obstacles_per_horizontal_wall)),
+            np.broadcast_to(x, (self.width, 1, obstacles_per_vertical_wall))
+        ], axis=2), shape)
+        ys = np.broadcast_to(np.concatenate([
+            np.broadcast_to(y, (1, self.height, obstacles_per_horizontal_wall)),
+            np.broadcast_to(y + along_vertical, (1, self.height, obstacles_per_vertical_wall))
+        ], axis=2), shape)
+
+        wall_up, wall_left = self.wall_arrays()
+        present = np.concatenate([
+            np.broadcast_to(wall_up[:, :, None], (self.width, self.height, obstacles_per_horizontal_wall)),
+            np.broadcast_to(wall_left[:, :, None], (self.width, self.height, obstacles_per_vertical_wall))
+        ], axis=2)
+        return np.concatenate([border_xs, xs[present]]), np.concatenate([border_ys, ys[present]])
 
+    @staticmethod
     def generate_border_obstacles(
-        self,
         screen_width, screen_height,
         obstacle_radius
-    ):
-        num_x_steps = int(screen_width / obstacle_radius)
-        num_y_steps = int(screen_height / obstacle_radius)
-
-        for i in range(num_x_steps):
-            current_x = i * obstacle_radius
-            self.obstacles.append(Obstacle(Position(current_x, screen_height)))
-
-        for i in range(num_y_steps):
-            current_y = i * obstacle_radius
-            self.obstacles.append(Obstacle(Position(screen_width, current_y)))
+    ) -> (np.ndarray, np.ndarray):
+        """
+        :return: x- and y-coordinates of the obstacles along the bottom and the right border
+        """
+        along_x = np.arange(int(screen_width / obstacle_radius)) * obstacle_radius
+        along_y = np.arange(int(screen_height / obstacle_radius)) * obstacle_radius
+        return (
+            np.concatenate([along_x, np.full(len(along_y), screen_width)]).astype(np.float64),
+            np.concatenate([np.full(len(along_x), screen_height), along_y]).astype(np.float64)
+        )
 
     def generate_maze(self):
-        x_start = random.randrange(0, self.width)
-        y_start = random.randrange(0, self.height)
+        x_start = self.random.randrange(0, self.width)
+        y_start = self.random.randrange(0, self.height)
         self.start_position = (x_start, y_start)
 
-        x_target = random.randrange(0, self.width)
-        y_target = random.randrange(0, self.height)
+        x_target = self.random.randrange(0, self.width)
+        y_target = self.random.randrange(0, self.height)
         while x_target == x_start and y_target == y_start:
-            x_target = random.randrange(0, self.width)
-            y_target = random.randrange(0, self.height)
+            x_target = self.random.randrange(0, self.width)
+            y_target = self.random.randrange(0, self.height)
 
         self.target = (x_target, y_target)
+        self.start_cell = self.start_position
+        self.target_cell = self.target
+
+        self.walls = carve_maze(
+            self.algorithm,
+            self.width, self.height,
+            x_start, y_start,
+            np.random.default_rng(self.random.getrandbits(64))
+        )
 
-        self.recursive_dfs(x_start, y_start)
-
-    def recursive_dfs(self, x, y):
-        cell = self.grid[x][y]
-        cell.is_visited = True
+    def compute_flow_field(self):
+        """
+        Compute distance_to_target and next_step unless done before. Only routing needs
+        them, so they are not computed along with the maze.
+        """
+        if self.next_step is None:
+            self.distance_to_target, self.next_step = flow_field(self.walls, *self.target_cell)
+
+    def route_step(self, x, y) -> (int, int):
+        """
+        :return: the neighbour of cell (x, y) on its shortest route to the target cell,
+            (x, y) itself if it is the target cell
+        """
+        self.compute_flow_field()
+        dx, dy = STEP_OFFSETS[self.next_step[x, y]]
+        return x + dx, y + dy
+
+    def cell_at(self, position) -> (int, int):
+        """
+        :return: the cell containing the given world position, clamped to the maze
+        """
+        return (
+            min(max(int(position[0] // self.cell_width), 0), self.width - 1),
+            min(max(int(position[1] // self.cell_height), 0), self.height - 1)
+        )
 
-        order = list(range(4))
-        shuffle(order)
-
-        for i in order:
-            if i == 0:
-                self.try_cell_above(x, y, cell)
-            elif i == 1:
-                self.try_cell_below(x, y)
-            elif i == 2:
-                self.try_cell_left_of(x, y, cell)
-            else:
-                self.try_cell_right_of(x, y)
-
-    def try_cell_above(self, x, y, previous_cell):
-        up_coords = self.get_cell_above(x, y)
-        if up_coords[0] >= 0:
-            cell_above = self.grid[up_coords[0]][up_coords[1]]
-            if not cell_above.is_visited:
-                previous_cell.wall_up = False
-                self.recursive_dfs(*up_coords)
-
-    def try_cell_below(self, x, y):
-        down_coords = self.get_cell_below(x, y)
-        if down_coords[0] >= 0:
-            cell_below = self.grid[down_coords[0]][down_coords[1]]
-            if not cell_below.is_visited:
-                cell_below.wall_up = False
-                self.recursive_dfs(*down_coords)
-
-    def try_cell_left_of(self, x, y, previous_cell):
-        left_coords = self.get_cell_left_of(x, y)
-        if left_coords[0] >= 0:
-            left_cell = self.grid[left_coords[0]][left_coords[1]]
-            if not left_cell.is_visited:
-                previous_cell.wall_left = False
-                self.recursive_dfs(*left_coords)
-
-    def try_cell_right_of(self, x, y):
-        right_coords = self.get_cell_right_of(x, y)
-        if right_coords[0] >= 0:
-            right_cell = self.grid[right_coords[0]][right_coords[1]]
-            if not right_cell.is_visited:
-                right_cell.wall_left = False
-                self.recursive_dfs(*right_coords)
+    def cell_center(self, x, y) -> Position:
+        return Position(self.cell_width * (x + 0.5), self.cell_height * (y + 0.5))
 
     @staticmethod
     def get_cell_above(x, y) -> (int, int):
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from distance_field import DistanceField
+from level import Geometry, Level, Obstacle
+from maze import MazeAlgorithm
+from obstacle_store import ObstacleStore
+from player import Player
+from spatial_index import SpatialHash
+from wall_segments import WallSegments
+
+"""
+A level is saved as a directory of .npy files plus a small meta.json.
+Arrays are loaded as read-only memory maps, so loading does not copy or parse
+the maze, the obstacles or the spatial index.
+"""
+FORMAT_VERSION = 3
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.level_cache')
+
+
+def save_level(level: Level, directory: str):
+    """
+    Save a level whose objects have been generated
+
+    :param level: level to save
+    :param directory: directory to write to. An existing one is only moved aside once the
+        new level is complete, so readers either find the old level, the new one or none.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=parent)
+
+    store = level.obstacle_store
+    segments = level.wall_segments
+    index = level.spatial_index
+    arrays = {
+        'walls': level.walls,
+        'obstacles_x': store.x,
+        'obstacles_y': store.y,
+        'segments': np.stack([segments.x0, segments.y0, segments.x1, segments.y1]),
+        'index_indices': index.indices,
+        'index_offsets': index.offsets,
+    }
+    if segments.spatial_index is not None:
+        arrays['segment_index_indices'] = segments.spatial_index.indices
+        arrays['segment_index_offsets'] = segments.spatial_index.offsets
+    if level.next_step is not None:
+        arrays['distance_to_target'] = level.distance_to_target
+        arrays['next_step'] = level.next_step
+    if level.distance_field is not None:
+        arrays['distance_field'] = level.distance_field.field
+    for name, array in arrays.items():
+        np.save(os.path.join(temporary, name + '.npy'), np.ascontiguousarray(array))
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'seed': level.seed,
+        'width': level.width,
+        'height': level.height,
+        'start_cell': list(level.start_cell),
+        'target_cell': list(level.target_cell),
+        'screen_dimensions': list(level.screen_dimensions),
+        'obstacle_radius': level.obstacle_radius,
+        'geometry': level.geometry.name,
+        'algorithm': level.algorithm.name,
+        'index_shape': [index.num_columns, index.num_rows],
+        'segment_index_shape': None if segments.spatial_index is None else [
+            segments.spatial_index.num_columns,
+            segments.spatial_index.num_rows
+        ],
+        'flow_field': level.next_step is not None,
+        'distance_field': None if level.distance_field is None else [
+            level.distance_field.resolution,
+            level.distance_field.max_distance
+        ],
+    }
+    with open(os.path.join(temporary, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+
+    if os.path.exists(directory):
+        replaced = temporary + '.replaced'
+        os.replace(directory, replaced)
+        os.replace(temporary, directory)
+        shutil.rmtree(replaced)
+    else:
+        os.replace(temporary, directory)
+
+
+def load_level(directory: str) -> Level:
+    """
+    Load a level saved by save_level, memory mapping its arrays
+
+    :return: a level ready to be played, like after Level.generate_objects
+    """
+    with open(os.path.join(directory, 'meta.json')) as file:
+        meta = json.load(file)
+    if meta['version'] != FORMAT_VERSION:
+        raise ValueError(f"unsupported level format version {meta['version']}")
+
+    def load(name):
+        return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+    level = Level(
+        meta['width'], meta['height'],
+        seed=meta['seed'],
+        generate=False,
+        algorithm=MazeAlgorithm[meta.get('algorithm', MazeAlgorithm.DFS.name)]
+    )
+    level.walls = load('walls')
+    if meta['flow_field']:
+        level.distance_to_target = load('distance_to_target')
+        level.next_step = load('next_step')
+    level.start_cell = tuple(meta['start_cell'])
+    level.target_cell = tuple(meta['target_cell'])
+    level.place_in_screen(*meta['screen_dimensions'], meta['obstacle_radius'], Geometry[meta['geometry']])
+
+    level.obstacle_store = ObstacleStore(load('obstacles_x'), load('obstacles_y'))
+    level.wall_segments = WallSegments(*load('segments'))
+    level.spatial_index = SpatialHash(
+        level.cell_width, level.cell_height,
+        load('index_indices'), load('index_offsets'),
+        *meta['index_shape']
+    )
+    if meta['segment_index_shape'] is not None:
+        level.wall_segments.spatial_index = SpatialHash(
+            level.cell_width, level.cell_height,
+            load('segment_index_indices'), load('segment_index_offsets'),
+            *meta['segment_index_shape']
+        )
+    if meta['distance_field'] is not None:
+        level.distance_field = DistanceField(load('distance_field'), *meta['distance_field'])
+    return level
+
+
+def level_key(
+    seed: int,
+    width: int, height: int,
+    screen_dimensions: (int, int),
+    obstacle_radius,
+    geometry: Geometry,
+    distance_field_resolution=None,
+    algorithm=MazeAlgorithm.DFS
+) -> str:
+    """
+    :return: content address of the level generated from these parameters, including
+        Player.VIEWING_RADIUS_IN_CELLS which bounds the distance field
+    """
+    description = json.dumps([
+        FORMAT_VERSION, seed, width, height,
+        list(screen_dimensions), obstacle_radius, geometry.name,
+        distance_field_resolution, algorithm.name, Player.VIEWING_RADIUS_IN_CELLS
+    ])
+    return hashlib.sha256(description.encode()).hexdigest()[:24]
+
+
+class LevelCache:
+    """
+    Levels saved under the hash of the parameters they were generated from.
+    A cache hit memory maps the saved level instead of generating it again.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY):
+        self.directory = directory
+
+    def path(self, *key_parameters) -> str:
+        return os.path.join(self.directory, level_key(*key_parameters))
+
+    def get(
+        self,
+        seed: int,
+        width=Level.DEFAULT_MAZE_DIMENSIONS[0], height=Level.DEFAULT_MAZE_DIMENSIONS[1],
+        screen_dimensions=(1200, 800),
+        obstacle_radius=Obstacle.DEFAULT_RADIUS,
+        geometry=Geometry.Points,
+        distance_field_resolution=None,
+        algorithm=MazeAlgorithm.DFS
+    ) -> Level:
+        """
+        :return: the level for these parameters, generated and saved on a cache miss
+        """
+        if seed is None:
+            raise ValueError('only seeded levels can be cached')
+
+        path = self.path(
+            seed, width, height, screen_dimensions, obstacle_radius, geometry, distance_field_resolution, algorithm
+        )
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            return load_level(path)
+
+        level = Level(width, height, seed=seed, algorithm=algorithm)
+        level.generate_objects(*screen_dimensions, obstacle_radius, geometry, distance_field_resolution)
+        save_level(level, path)
+        return level
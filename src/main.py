@@ -1,8 +1,16 @@
+import argparse
+
 from game import Game
+from profiler import FrameProfiler
 
 
 def main():
-    Game()
+    parser = argparse.ArgumentParser(description='Navigate the maze by ear')
+    parser.add_argument('--profile', action='store_true', help='time every frame and write a trace when the game ends')
+    parser.add_argument('--record', default=None, help='record the session to this file, replay it with replay.py')
+    args = parser.parse_args()
+
+    Game(FrameProfiler(enabled=args.profile), args.record)
 
 
 if __name__ == "__main__":
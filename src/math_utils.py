@@ -8,6 +8,8 @@ Position = pygame.math.Vector2
 
 @dataclass
 class Angle:
+    __slots__ = ('rad',)
+
     def __init__(self, rad):
         self.rad = rad
 
@@ -66,6 +68,8 @@ class Angle:
 
 @dataclass
 class PolarCoordinate:
+    __slots__ = ('angle', 'radius')
+
     def __init__(self, angle: Angle, radius: float):
         self.angle = angle
         self.radius = radius
@@ -75,3 +79,17 @@ class PolarCoordinate:
             self.radius * np.cos(self.angle.rad),
             -self.radius * np.sin(self.angle.rad)
         )
+
+
+def angles_in_bounds(rads: np.ndarray, lb: Angle, ub: Angle) -> np.ndarray:
+    """
+    Vectorized version of Angle.is_in_bounds
+
+    :param rads: angles in radians, within [0, 2PI)
+    :param lb: lower bound
+    :param ub: upper bound
+    :return: boolean mask, True where the angle lies strictly between the bounds
+    """
+    if lb > ub:
+        return (rads < ub.rad) | (rads > lb.rad)
+    return (rads < ub.rad) & (rads > lb.rad)
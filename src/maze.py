@@ -0,0 +1,327 @@
+import enum
+from array import array
+from itertools import permutations
+from typing import Callable
+import numpy as np
+
+WALL_UP = 1
+WALL_LEFT = 2
+ALL_WALLS = WALL_UP | WALL_LEFT
+
+"""
+Maze generators carve passages into a grid of closed cells. They all share the
+signature of carve_dfs, so they can be used interchangeably, see carve_maze.
+"""
+MazeGenerator = Callable[[int, int, int, int, np.random.Generator], np.ndarray]
+
+
+def padded_visited(width: int, height: int) -> bytearray:
+    """
+    :return: visited flag per cell of a grid padded by one cell on each side, flat in rows
+        of width + 2 cells. Only the padding is marked visited.
+    """
+    row = width + 2
+    visited = bytearray([1]) * (row * (height + 2))
+    for y in range(1, height + 1):
+        visited[y * row + 1:y * row + width + 1] = bytes(width)
+    return visited
+
+
+def unpad(flat, width: int, height: int, dtype=np.uint8) -> np.ndarray:
+    """
+    :param flat: buffer of a padded grid, see padded_visited
+    :return: array of shape (width, height) without the padding, indexed by [x, y]
+    """
+    grid = np.frombuffer(flat, dtype=dtype).reshape(height + 2, width + 2)
+    return np.ascontiguousarray(grid[1:-1, 1:-1].T)
+
+
+def open_wall(walls: bytearray, cell: int, neighbour: int, row: int):
+    """remove the wall between two adjacent cells of a padded grid"""
+    owner = max(cell, neighbour)
+    walls[owner] &= ~(WALL_UP if abs(cell - neighbour) == row else WALL_LEFT)
+
+
+def carve_dfs(width: int, height: int, x_start: int, y_start: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized depth-first search with an explicit stack.
+
+    Cells are addressed by a flat index into a grid padded by one cell on each
+    side; the padding is marked visited, so neighbours never need a bounds check.
+    Every cell gets a random order in which its neighbours are tried, like the
+    shuffled order of the recursive version.
+
+    :param width: number of cells in x-direction
+    :param height: number of cells in y-direction
+    :param x_start: x-coordinate of the cell to start carving from
+    :param y_start: y-coordinate of the cell to start carving from
+    :param rng: source of randomness
+    :return: uint8 array of shape (width, height) holding WALL_UP and WALL_LEFT bits per cell
+    """
+    row = width + 2
+    size = row * (height + 2)
+
+    walls = bytearray([ALL_WALLS]) * size
+    visited = padded_visited(width, height)
+
+    """per direction: offset to the neighbour, whether the wall belongs to the neighbour, and the wall bit"""
+    directions = (
+        (-row, False, WALL_UP),
+        (row, True, WALL_UP),
+        (-1, False, WALL_LEFT),
+        (1, True, WALL_LEFT),
+    )
+    orders = list(permutations(directions))
+    order_per_cell = rng.integers(0, len(orders), size=size, dtype=np.uint8).tobytes()
+
+    start = (y_start + 1) * row + x_start + 1
+    visited[start] = 1
+    stack = array('l', [start])
+
+    while stack:
+        current = stack[-1]
+        for offset, is_neighbours_wall, wall in orders[order_per_cell[current]]:
+            neighbour = current + offset
+            if not visited[neighbour]:
+                break
+        else:
+            stack.pop()
+            continue
+
+        if is_neighbours_wall:
+            walls[neighbour] ^= wall
+        else:
+            walls[current] ^= wall
+        visited[neighbour] = 1
+        stack.append(neighbour)
+
+    return unpad(walls, width, height)
+
+
+def carve_kruskal(width: int, height: int, x_start: int, y_start: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized Kruskal's algorithm: visit all inner walls in random order and remove
+    every wall whose cells are not connected yet, tracked with a union-find.
+    Gives many short dead ends. The start cell is irrelevant, see carve_dfs for the parameters.
+    """
+    row = width + 2
+    walls = bytearray([ALL_WALLS]) * (row * (height + 2))
+
+    """inner walls as cell * 2 + 0 for the wall above, cell * 2 + 1 for the wall to the left"""
+    x, y = np.meshgrid(np.arange(1, width + 1), np.arange(1, height + 1))
+    cells = (y * row + x).ravel()
+    has_wall_up = (y > 1).ravel()
+    has_wall_left = (x > 1).ravel()
+    candidates = np.concatenate([cells[has_wall_up] * 2, cells[has_wall_left] * 2 + 1])
+    candidates = rng.permutation(candidates).tolist()
+
+    parent = array('l', range(len(walls)))
+
+    def find(cell):
+        while parent[cell] != cell:
+            """path halving"""
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    remaining = width * height - 1
+    for candidate in candidates:
+        if remaining == 0:
+            break
+        cell = candidate >> 1
+        wall = WALL_LEFT if candidate & 1 else WALL_UP
+        root = find(cell)
+        neighbour_root = find(cell - 1 if wall == WALL_LEFT else cell - row)
+        if root == neighbour_root:
+            continue
+        parent[root] = neighbour_root
+        walls[cell] ^= wall
+        remaining -= 1
+
+    return unpad(walls, width, height)
+
+
+def carve_prim(width: int, height: int, x_start: int, y_start: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Randomized Prim's algorithm: grow the maze from the start cell by repeatedly opening
+    a random wall between the maze and a cell outside of it.
+    Gives short, branching passages radiating from the start. See carve_dfs for the parameters.
+    """
+    row = width + 2
+    walls = bytearray([ALL_WALLS]) * (row * (height + 2))
+    visited = padded_visited(width, height)
+    offsets = (-row, row, -1, 1)
+
+    """every cell enters the frontier at most once per neighbour, so this many picks suffice"""
+    picks = iter(rng.random(4 * width * height).tolist())
+
+    start = (y_start + 1) * row + x_start + 1
+    visited[start] = 1
+    """walls from cells in the maze to cells which might be outside, as pairs of cells"""
+    frontier = [(start, start + offset) for offset in offsets if not visited[start + offset]]
+
+    while frontier:
+        index = int(next(picks) * len(frontier))
+        cell, neighbour = frontier[index]
+        frontier[index] = frontier[-1]
+        frontier.pop()
+        if visited[neighbour]:
+            continue
+
+        open_wall(walls, cell, neighbour, row)
+        visited[neighbour] = 1
+        frontier.extend(
+            (neighbour, neighbour + offset)
+            for offset in offsets if not visited[neighbour + offset]
+        )
+
+    return unpad(walls, width, height)
+
+
+def carve_wilson(width: int, height: int, x_start: int, y_start: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Wilson's algorithm: from every cell outside the maze, walk randomly until the maze
+    is hit and add the loop-erased walk as a new passage. The start cell is the initial maze.
+    Samples uniformly from all spanning trees, so the mazes are free of any bias in
+    their structure. See carve_dfs for the parameters.
+    """
+    row = width + 2
+    size = row * (height + 2)
+    walls = bytearray([ALL_WALLS]) * size
+    outside = padded_visited(width, height)
+    in_maze = bytearray(size)
+
+    """neighbours of every cell within the grid; random numbers below 12 pick one of 2, 3 or 4 without bias"""
+    neighbours = [
+        tuple(cell + offset for offset in (-row, row, -1, 1) if not outside[cell + offset])
+        if not outside[cell] else ()
+        for cell in range(size)
+    ]
+    choices = []
+    next_choice = 0
+    """the cell each cell of the current walk was left to, the latest exit erases loops"""
+    exits = array('l', [0]) * size
+
+    start = (y_start + 1) * row + x_start + 1
+    in_maze[start] = 1
+    x, y = np.meshgrid(np.arange(1, width + 1), np.arange(1, height + 1))
+    for first in rng.permutation((y * row + x).ravel()).tolist():
+        if in_maze[first]:
+            continue
+
+        cell = first
+        while not in_maze[cell]:
+            if next_choice == len(choices):
+                choices = rng.integers(0, 12, size=max(1024, width * height)).tolist()
+                next_choice = 0
+            options = neighbours[cell]
+            exits[cell] = options[choices[next_choice] % len(options)]
+            next_choice += 1
+            cell = exits[cell]
+
+        cell = first
+        while not in_maze[cell]:
+            in_maze[cell] = 1
+            open_wall(walls, cell, exits[cell], row)
+            cell = exits[cell]
+
+    return unpad(walls, width, height)
+
+
+class MazeAlgorithm(enum.Enum):
+    """how a maze is carved, see GENERATORS"""
+    DFS = 1
+    Kruskal = 2
+    Prim = 3
+    Wilson = 4
+
+
+GENERATORS = {
+    MazeAlgorithm.DFS: carve_dfs,
+    MazeAlgorithm.Kruskal: carve_kruskal,
+    MazeAlgorithm.Prim: carve_prim,
+    MazeAlgorithm.Wilson: carve_wilson,
+}
+
+
+def carve_maze(
+    algorithm: MazeAlgorithm,
+    width: int, height: int,
+    x_start: int, y_start: int,
+    rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Carve a perfect maze, with exactly one route between any two cells, see carve_dfs for the parameters
+    """
+    return GENERATORS[algorithm](width, height, x_start, y_start, rng)
+
+
+"""moves from a cell to its neighbour, as stored in the table of flow_field"""
+STAY = 0
+STEP_UP = 1
+STEP_DOWN = 2
+STEP_LEFT = 3
+STEP_RIGHT = 4
+"""cell offset (dx, dy) per move"""
+STEP_OFFSETS = {
+    STAY: (0, 0),
+    STEP_UP: (0, -1),
+    STEP_DOWN: (0, 1),
+    STEP_LEFT: (-1, 0),
+    STEP_RIGHT: (1, 0),
+}
+
+
+def flow_field(walls: np.ndarray, x_target: int, y_target: int) -> (np.ndarray, np.ndarray):
+    """
+    Breadth-first search from the target over the open passages of a maze,
+    on the same padded flat grid as carve_dfs
+
+    :param walls: uint8 array of shape (width, height) holding WALL_UP and WALL_LEFT bits per cell
+    :param x_target: x-coordinate of the target cell
+    :param y_target: y-coordinate of the target cell
+    :return: int32 array of shape (width, height) with the number of moves from each cell to the
+        target, -1 if unreachable, and uint8 array of the same shape with the first move of the
+        shortest route, STAY at the target and in unreachable cells
+    """
+    width, height = walls.shape
+    row = width + 2
+    size = row * (height + 2)
+
+    padded_walls = np.full((height + 2, row), ALL_WALLS, dtype=np.uint8)
+    padded_walls[1:-1, 1:-1] = walls.T
+    flat_walls = padded_walls.tobytes()
+
+    distances = array('l', [-1]) * size
+    moves = bytearray(size)
+    """the padding counts as visited, so the search never leaves the grid"""
+    visited = padded_visited(width, height)
+
+    """per direction: offset to the neighbour, cell holding the wall, wall bit and the move back"""
+    directions = (
+        (-row, 0, WALL_UP, STEP_DOWN),
+        (row, row, WALL_UP, STEP_UP),
+        (-1, 0, WALL_LEFT, STEP_RIGHT),
+        (1, 1, WALL_LEFT, STEP_LEFT),
+    )
+
+    target = (y_target + 1) * row + x_target + 1
+    visited[target] = 1
+    distances[target] = 0
+    queue = array('l', [target])
+    head = 0
+
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        distance = distances[current] + 1
+        for offset, wall_offset, wall, move_back in directions:
+            neighbour = current + offset
+            if visited[neighbour] or flat_walls[current + wall_offset] & wall:
+                continue
+            visited[neighbour] = 1
+            distances[neighbour] = distance
+            moves[neighbour] = move_back
+            queue.append(neighbour)
+
+    return unpad(distances, width, height, np.dtype('l')).astype(np.int32), unpad(moves, width, height)
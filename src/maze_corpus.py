@@ -0,0 +1,89 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from maze import MazeAlgorithm, carve_maze
+
+"""mazes generated per task of the process pool"""
+DEFAULT_BATCH_SIZE = 64
+
+
+def maze_rng(seed: int, index: int) -> np.random.Generator:
+    """
+    :return: the source of randomness of maze index of the corpus seeded with seed,
+        the same as SeedSequence(seed).spawn(...)[index]
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generate_batch(seed: int, start: int, stop: int, width: int, height: int, algorithm: MazeAlgorithm) -> np.ndarray:
+    """
+    :return: uint8 array of shape (stop - start, width, height) holding the mazes start to stop of the corpus
+    """
+    mazes = np.empty((stop - start, width, height), dtype=np.uint8)
+    for index in range(start, stop):
+        rng = maze_rng(seed, index)
+        x_start, y_start = rng.integers(0, (width, height))
+        mazes[index - start] = carve_maze(algorithm, width, height, int(x_start), int(y_start), rng)
+    return mazes
+
+
+def generate_mazes(
+    count: int,
+    width: int, height: int,
+    algorithm=MazeAlgorithm.DFS,
+    seed=0,
+    workers: int = None,
+    batch_size=DEFAULT_BATCH_SIZE
+) -> np.ndarray:
+    """
+    Generate a corpus of mazes in parallel. Every maze only depends on the seed and its
+    index, so the corpus does not depend on the number of workers or the batch size.
+
+    :param count: number of mazes
+    :param algorithm: how the mazes are carved
+    :param workers: number of processes, all cores if None, no process pool if 1
+    :return: uint8 array of shape (count, width, height) holding WALL_UP and WALL_LEFT bits per cell
+    """
+    batches = [(start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+    if workers == 1:
+        return np.concatenate(
+            [generate_batch(seed, start, stop, width, height, algorithm) for start, stop in batches]
+            or [np.empty((0, width, height), dtype=np.uint8)]
+        )
+
+    mazes = np.empty((count, width, height), dtype=np.uint8)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (start, stop, executor.submit(generate_batch, seed, start, stop, width, height, algorithm))
+            for start, stop in batches
+        ]
+        for start, stop, future in futures:
+            mazes[start:stop] = future.result()
+    return mazes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a corpus of seeded mazes and save it as .npy')
+    parser.add_argument('output')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--maze', type=int, nargs=2, default=(16, 16))
+    parser.add_argument('--algorithm', choices=[algorithm.name for algorithm in MazeAlgorithm], default='DFS')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    mazes = generate_mazes(args.count, *args.maze, MazeAlgorithm[args.algorithm], args.seed, args.workers)
+    wall_time = time.perf_counter() - start
+    np.save(args.output, mazes)
+    print(
+        f'{args.count} {args.algorithm} mazes of {args.maze[0]}x{args.maze[1]} cells in {wall_time:.3f}s '
+        f'({args.count / max(wall_time, 1e-9):.0f} mazes/s on {args.workers or os.cpu_count()} workers)'
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+from dataclasses import dataclass
+import numpy as np
+
+from player import Direction, Player
+
+
+@dataclass
+class ScanResult:
+    """outcome of scanning all obstacles from the player's point of view"""
+    collided: bool
+    closest_left: float
+    closest_center: float
+    closest_right: float
+    """number of obstacles tested during the scan"""
+    tested: int = 0
+
+
+class ObstacleStore:
+    """
+    Struct-of-arrays storage of all obstacles of a level, so that the
+    surroundings of the player can be scanned with a few array operations
+    instead of one Python iteration per obstacle
+    """
+
+    def __init__(self, xs, ys):
+        self.x = np.asarray(xs, dtype=np.float64)
+        self.y = np.asarray(ys, dtype=np.float64)
+        """replaces Obstacle.color, True if the obstacle is in sight of the player"""
+        self.in_sight = np.zeros(len(self.x), dtype=bool)
+        self.visible_indices = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.x)
+
+    def scan(self, player: Player, candidates: np.ndarray = None) -> ScanResult:
+        """
+        Update which obstacles are in sight of the player and find the closest
+        obstacle per direction. Behaves like the per-obstacle loop in
+        Game.scan_surroundings.
+
+        :param player: the player scanning its surroundings
+        :param candidates: indices of the obstacles to consider, all obstacles if None.
+            Obstacles left out are treated as out of sight.
+        :return: whether the player collided and the closest distance per direction
+        """
+        if candidates is None:
+            xs, ys = self.x, self.y
+        else:
+            xs, ys = self.x[candidates], self.y[candidates]
+
+        rads, distances = player.world_positions_to_relative_polar_coordinates(xs, ys)
+        visible = player.can_see_all(rads, distances)
+
+        self.in_sight[self.visible_indices] = False
+        self.visible_indices = np.flatnonzero(visible) if candidates is None else candidates[visible]
+        self.in_sight[self.visible_indices] = True
+
+        return closest_per_direction(player, rads[visible], distances[visible], len(xs))
+
+    def sources_in_sight(self, player: Player) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        :return: indices of the obstacles in sight, and their angle and distance relative to the player
+        """
+        indices = self.visible_indices
+        rads, distances = player.world_positions_to_relative_polar_coordinates(self.x[indices], self.y[indices])
+        return indices, rads, distances
+
+
+class IncrementalScanner:
+    """
+    Scans an ObstacleStore with the same results as ObstacleStore.scan, but keeps
+    the obstacles around the frustum from one scan to the next. The neighbourhood
+    is looked up in the spatial index only once the frustum leaves it, and the polar
+    coordinates of its obstacles are only recomputed once the player moves, not when
+    it only turns. Every scan still tests all obstacles of the neighbourhood, the
+    frustum's bounding box plus a margin, so a frame in motion costs in proportion to
+    the area around the frustum rather than its boundary. Only the in_sight flags are
+    updated incrementally, for the obstacles entering or leaving the frustum.
+    """
+    """the neighbourhood extends the frustum's bounding box by this fraction of the viewing radius"""
+    MARGIN_IN_RADII = 0.25
+
+    def __init__(self, store: ObstacleStore, spatial_index, margin_in_radii=MARGIN_IN_RADII):
+        """
+        :param spatial_index: SpatialHash over the obstacles of store
+        """
+        self.store = store
+        self.spatial_index = spatial_index
+        self.margin_in_radii = margin_in_radii
+
+        self.neighbourhood_box = None
+        self.neighbours = np.empty(0, dtype=np.int64)
+        self.neighbour_xs = np.empty(0)
+        self.neighbour_ys = np.empty(0)
+        """position the polar coordinates of the neighbours are relative to"""
+        self.polar_origin = None
+        self.rads = np.empty(0)
+        self.distances = np.empty(0)
+        """which neighbours were in sight after the last scan"""
+        self.visible = np.zeros(0, dtype=bool)
+        self.visible_indices = None
+
+    def scan(self, player: Player) -> ScanResult:
+        frustum = player.frustum()
+        if not self.contains(frustum.bounding_box):
+            self.gather_neighbours(frustum)
+
+        origin = (frustum.x, frustum.y)
+        if origin != self.polar_origin:
+            self.rads, self.distances = player.world_positions_to_relative_polar_coordinates(
+                self.neighbour_xs, self.neighbour_ys
+            )
+            self.polar_origin = origin
+
+        visible = player.can_see_all(self.rads, self.distances)
+        self.update_in_sight(visible)
+        return closest_per_direction(player, self.rads[visible], self.distances[visible], len(self.neighbours))
+
+    def update_in_sight(self, visible: np.ndarray):
+        """
+        Flip in_sight of the neighbours entering or leaving the frustum, unless
+        the store has been scanned by someone else since the last scan
+        """
+        store = self.store
+        if len(self.visible) == len(visible) and store.visible_indices is self.visible_indices:
+            store.in_sight[self.neighbours[self.visible & ~visible]] = False
+            store.in_sight[self.neighbours[visible & ~self.visible]] = True
+        else:
+            store.in_sight[store.visible_indices] = False
+            store.in_sight[self.neighbours[visible]] = True
+        self.visible = visible
+        store.visible_indices = self.visible_indices = self.neighbours[visible]
+
+    def contains(self, box) -> bool:
+        if self.neighbourhood_box is None:
+            return False
+        x_min, y_min, x_max, y_max = self.neighbourhood_box
+        return x_min <= box[0] and y_min <= box[1] and box[2] <= x_max and box[3] <= y_max
+
+    def gather_neighbours(self, frustum):
+        margin = self.margin_in_radii * frustum.radius
+        x_min, y_min, x_max, y_max = frustum.bounding_box
+        self.neighbourhood_box = (x_min - margin, y_min - margin, x_max + margin, y_max + margin)
+        self.neighbours = np.sort(self.spatial_index.candidates_in_box(*self.neighbourhood_box))
+        self.neighbour_xs = self.store.x[self.neighbours]
+        self.neighbour_ys = self.store.y[self.neighbours]
+        self.polar_origin = None
+        self.visible = np.zeros(0, dtype=bool)
+        self.visible_indices = None
+
+
+def closest_per_direction(player: Player, rads: np.ndarray, distances: np.ndarray, tested: int) -> ScanResult:
+    """
+    :param rads: angles of the obstacles in sight relative to the player
+    :param distances: distances of the obstacles in sight to the player
+    :param tested: number of obstacles tested to find those in sight
+    """
+    no_obstacle = player.viewing_sector.radius + 1
+    if distances.size and distances.min() <= Player.BODY_RADIUS:
+        return ScanResult(True, no_obstacle, no_obstacle, no_obstacle, tested)
+
+    directions = player.directions_relative_to_player(rads)
+    closest = [
+        closest_distance(distances, directions == direction.value, no_obstacle)
+        for direction in (Direction.Left, Direction.Center, Direction.Right)
+    ]
+    return ScanResult(False, *closest, tested)
+
+
+def closest_distance(distances: np.ndarray, mask: np.ndarray, default: float) -> float:
+    selected = distances[mask]
+    return float(selected.min()) if selected.size else default
@@ -8,11 +8,63 @@ class Direction(enum.Enum):
     Right = 3
 
 
+class Frustum:
+    """
+    Viewing frustum of a player in one pose: the sector bounds, the bounds between
+    the left, center and right section, and the bounding box of the frustum
+    """
+    __slots__ = (
+        'direction_rad', 'x', 'y', 'radius', 'radius_squared',
+        'lower_bound', 'upper_bound',
+        'right_center_bound', 'left_center_bound', 'left_bound',
+        'bounding_box'
+    )
+
+    def __init__(self, position: Position, direction: Angle, viewing_bounds: PolarCoordinate):
+        self.direction_rad = direction.rad
+        self.x = position.x
+        self.y = position.y
+        self.radius = viewing_bounds.radius
+        self.radius_squared = self.radius * self.radius
+
+        self.lower_bound = direction - viewing_bounds.angle
+        self.upper_bound = direction + viewing_bounds.angle
+
+        section_arc_length = viewing_bounds.angle * (2 / 3)
+        self.left_bound = self.upper_bound
+        self.left_center_bound = self.left_bound - section_arc_length
+        self.right_center_bound = self.lower_bound + section_arc_length
+
+        corners = [self.lower_bound, self.upper_bound]
+        """the arc bulges beyond its end points where it crosses an axis"""
+        for quarter in range(4):
+            axis = Angle(quarter * np.pi / 2)
+            if axis.is_in_bounds(self.lower_bound, self.upper_bound):
+                corners.append(axis)
+        xs = [self.x] + [self.x + self.radius * np.cos(angle.rad) for angle in corners]
+        ys = [self.y] + [self.y - self.radius * np.sin(angle.rad) for angle in corners]
+        self.bounding_box = (min(xs), min(ys), max(xs), max(ys))
+
+    def matches(self, position: Position, direction: Angle, radius: float) -> bool:
+        return (
+            self.direction_rad == direction.rad
+            and self.x == position.x
+            and self.y == position.y
+            and self.radius == radius
+        )
+
+
 class Player:
+    """MOVEMENT_SPEED and TURNING_SPEED are per tick of TICK_MS milliseconds"""
+    TICK_MS = 1000 / 60
     MOVEMENT_SPEED = 3
     TURNING_SPEED = Angle(1 / (32 * np.pi))
-    """radius becomes radius * min(cell width, cell height) of maze, see Level.generate_obstacles"""
-    VIEWING_BOUNDS = PolarCoordinate(Angle(np.pi / 5), 1.5)
+    VIEWING_RADIUS_IN_CELLS = 1.5
+    """
+    half the viewing angle and the viewing radius in cells; every level scales the radius
+    to VIEWING_RADIUS_IN_CELLS * min(cell width, cell height), see Level.viewing_bounds
+    """
+    VIEWING_BOUNDS = PolarCoordinate(Angle(np.pi / 5), VIEWING_RADIUS_IN_CELLS)
     COLOR = 'blue'
     BODY_RADIUS = 20
     FRUSTUM_COLOR = 'white'
@@ -26,23 +78,50 @@ class Player:
         self,
         position: Position,
         direction: Angle,
-        screen_dimensions: (int, int)
+        screen_dimensions: (int, int),
+        viewing_sector: PolarCoordinate = None
     ):
+        """
+        :param viewing_sector: half the viewing angle and the viewing radius in world units,
+            usually the level's viewing_bounds, Player.VIEWING_BOUNDS if None
+        """
         self.position = position
         self.direction = direction
         self.screen_dimensions = screen_dimensions
+        self.viewing_sector = viewing_sector if viewing_sector is not None else Player.VIEWING_BOUNDS
+        """frustum of the current pose, rebuilt lazily after the pose changed"""
+        self.cached_frustum: Frustum = None
 
-    def turn_right(self):
-        self.direction -= Player.TURNING_SPEED
+    def turn_right(self, dt=TICK_MS):
+        """
+        :param dt: milliseconds the player turns for
+        """
+        self.direction -= Player.TURNING_SPEED * (dt / Player.TICK_MS)
+        self.cached_frustum = None
 
-    def turn_left(self):
-        self.direction += Player.TURNING_SPEED
+    def turn_left(self, dt=TICK_MS):
+        self.direction += Player.TURNING_SPEED * (dt / Player.TICK_MS)
+        self.cached_frustum = None
 
-    def move_forward(self):
-        increment = PolarCoordinate(self.direction, Player.MOVEMENT_SPEED).to_cartesian()
+    def move_forward(self, dt=TICK_MS):
+        """
+        :param dt: milliseconds the player moves for
+        """
+        increment = PolarCoordinate(self.direction, Player.MOVEMENT_SPEED * (dt / Player.TICK_MS)).to_cartesian()
         next_position = self.position + increment
         if self.is_in_screen_bounds(next_position):
             self.position = next_position
+            self.cached_frustum = None
+
+    def frustum(self) -> Frustum:
+        """
+        :return: the frustum of the current pose, only recomputed if the pose
+            or the viewing radius changed since the last call
+        """
+        frustum = self.cached_frustum
+        if frustum is None or not frustum.matches(self.position, self.direction, self.viewing_sector.radius):
+            frustum = self.cached_frustum = Frustum(self.position, self.direction, self.viewing_sector)
+        return frustum
 
     def is_in_screen_bounds(self, position: Position) -> bool:
         return (
@@ -50,14 +129,29 @@ class Player:
             and 0 < position.x < self.screen_dimensions[0]
         )
 
+    def viewing_bounds(self) -> (Angle, Angle):
+        """
+        :return: lower and upper bound of the viewing frustum
+        """
+        frustum = self.frustum()
+        return frustum.lower_bound, frustum.upper_bound
+
+    def section_bounds(self) -> (Angle, Angle, Angle):
+        """
+        Split the viewing frustum into a left, a center and a right section
+
+        :return: right-center bound, left-center bound and left bound
+        """
+        frustum = self.frustum()
+        return frustum.right_center_bound, frustum.left_center_bound, frustum.left_bound
+
     def is_facing(self, point: PolarCoordinate) -> bool:
-        upper_bound = self.direction + Player.VIEWING_BOUNDS.angle
-        lower_bound = self.direction - Player.VIEWING_BOUNDS.angle
+        lower_bound, upper_bound = self.viewing_bounds()
 
         return point.angle.is_in_bounds(lower_bound, upper_bound)
 
     def can_see(self, point: PolarCoordinate) -> bool:
-        is_close_enough = point.radius <= Player.VIEWING_BOUNDS.radius
+        is_close_enough = point.radius <= self.frustum().radius
 
         return is_close_enough and self.is_facing(point)
 
@@ -69,16 +163,17 @@ class Player:
         :param other: position to convert
         :return: converted polar coordinate
         """
-        vec = other - self.position
+        dx = other[0] - self.position.x
+        dy = other[1] - self.position.y
 
         """flip y-coordinate system because pixel coordinate system is upside down"""
-        rad = np.arctan2(-vec.y, vec.x)
+        rad = np.arctan2(-dy, dx)
 
         """shift range from [-PI, PI] to [0, 2PI]"""
         if rad < 0:
             rad += 2 * np.pi
 
-        return PolarCoordinate(Angle(rad), vec.length())
+        return PolarCoordinate(Angle(rad), np.sqrt(dx * dx + dy * dy))
 
     def relative_polar_coordinate_to_world_position(self, other: PolarCoordinate) -> Position:
         """
@@ -99,12 +194,7 @@ class Player:
         :param point: a polar coordinate within the viewing bounds
         :return: Left, Center or Right
         """
-        section_arc_length = Player.VIEWING_BOUNDS.angle * (2 / 3)
-
-        left_bound = self.direction + Player.VIEWING_BOUNDS.angle
-        right_bound = self.direction - Player.VIEWING_BOUNDS.angle
-        left_center_bound = left_bound - section_arc_length
-        right_center_bound = right_bound + section_arc_length
+        right_center_bound, left_center_bound, left_bound = self.section_bounds()
 
         if point.angle.is_in_bounds(left_center_bound, left_bound):
             return Direction.Left
@@ -115,3 +205,65 @@ class Player:
 
     def distance_to(self, other: Position) -> float:
         return (self.position - other).length()
+
+    def world_positions_to_relative_polar_coordinates(
+        self,
+        xs: np.ndarray,
+        ys: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
+        """
+        Vectorized version of world_position_to_relative_polar_coordinate
+
+        :param xs: x-coordinates of the positions to convert
+        :param ys: y-coordinates of the positions to convert
+        :return: angles in radians within [0, 2PI) and distances to the player
+        """
+        dx = xs - self.position.x
+        dy = ys - self.position.y
+
+        rads = np.arctan2(-dy, dx)
+        rads = np.where(rads < 0, rads + 2 * np.pi, rads)
+
+        return rads, np.sqrt(dx * dx + dy * dy)
+
+    def is_facing_all(self, rads: np.ndarray) -> np.ndarray:
+        lower_bound, upper_bound = self.viewing_bounds()
+
+        return angles_in_bounds(rads, lower_bound, upper_bound)
+
+    def can_see_all(self, rads: np.ndarray, radii: np.ndarray) -> np.ndarray:
+        return (radii <= self.viewing_sector.radius) & self.is_facing_all(rads)
+
+    def directions_relative_to_player(self, rads: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of direction_relative_to_player
+
+        :param rads: angles in radians of points within the viewing bounds
+        :return: Direction values (Left, Center or Right) per point
+        """
+        right_center_bound, left_center_bound, left_bound = self.section_bounds()
+
+        return np.where(
+            angles_in_bounds(rads, left_center_bound, left_bound),
+            Direction.Left.value,
+            np.where(
+                angles_in_bounds(rads, right_center_bound, left_center_bound),
+                Direction.Center.value,
+                Direction.Right.value
+            )
+        )
+
+
+def interpolate_pose(
+    previous_position: Position, previous_direction: Angle,
+    position: Position, direction: Angle,
+    alpha: float
+) -> (Position, Angle):
+    """
+    Blend two consecutive poses of a player, turning along the shorter arc
+
+    :param alpha: 0 for the previous pose, 1 for the current one
+    """
+    interpolated_position = previous_position.lerp(position, alpha)
+    turn = (direction.rad - previous_direction.rad + np.pi) % (2 * np.pi) - np.pi
+    return interpolated_position, Angle((previous_direction.rad + alpha * turn) % (2 * np.pi))
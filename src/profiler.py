@@ -0,0 +1,139 @@
+import json
+import time
+from collections import deque
+from typing import Dict
+import numpy as np
+
+
+class NullPhase:
+    """returned by a disabled profiler, timing nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class PhaseTimer:
+    def __init__(self, profiler: 'FrameProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class FrameProfiler:
+    """
+    Per-frame timing of the phases of the game loop plus counters, kept for a
+    rolling summary and exportable as a Chrome/Perfetto trace.
+    When disabled, every call returns immediately.
+    """
+    FRAME_BUDGET_MS = 1000 / 60
+    SUMMARY_FRAMES = 300
+    MAX_TRACE_EVENTS = 200000
+
+    def __init__(
+        self,
+        enabled=False,
+        frame_budget_ms=FRAME_BUDGET_MS,
+        summary_frames=SUMMARY_FRAMES,
+        max_trace_events=MAX_TRACE_EVENTS
+    ):
+        self.enabled = enabled
+        self.frame_budget_ms = frame_budget_ms
+        self.origin = time.perf_counter_ns()
+        self.frame_start = 0
+
+        """phase -> milliseconds spent in the current frame"""
+        self.current_frame: Dict[str, float] = {}
+        """rolling window of past frames, each mapping phase -> milliseconds"""
+        self.history = deque(maxlen=summary_frames)
+        self.counters: Dict[str, int] = {'frames': 0, 'frames_over_budget': 0}
+        self.trace_events = deque(maxlen=max_trace_events)
+
+    def phase(self, name: str):
+        """
+        :return: context manager timing the enclosed code as the given phase
+        """
+        return PhaseTimer(self, name) if self.enabled else NULL_PHASE
+
+    def count(self, name: str, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter_ns()
+            self.current_frame = {}
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+
+        end = time.perf_counter_ns()
+        self.record('frame', self.frame_start, end)
+        self.counters['frames'] += 1
+        if self.current_frame['frame'] > self.frame_budget_ms:
+            self.counters['frames_over_budget'] += 1
+
+        self.history.append(self.current_frame)
+        self.trace_events.append({
+            'name': 'counters', 'ph': 'C', 'pid': 0, 'tid': 0,
+            'ts': (end - self.origin) / 1000,
+            'args': dict(self.counters)
+        })
+
+    def record(self, name: str, start: int, end: int):
+        """
+        :param start: perf_counter_ns at the start of the phase
+        :param end: perf_counter_ns at the end of the phase
+        """
+        self.current_frame[name] = self.current_frame.get(name, 0) + (end - start) / 1e6
+        self.trace_events.append({
+            'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+            'ts': (start - self.origin) / 1000,
+            'dur': (end - start) / 1000
+        })
+
+    def summary(self) -> Dict:
+        """
+        :return: mean, 95th percentile and maximum milliseconds per phase over the
+            rolling window, and the counters since the start
+        """
+        phases = {}
+        for name in {name for frame in self.history for name in frame}:
+            durations = np.array([frame.get(name, 0) for frame in self.history])
+            phases[name] = {
+                'mean_ms': float(durations.mean()),
+                'p95_ms': float(np.percentile(durations, 95)),
+                'max_ms': float(durations.max()),
+            }
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{name:<24} mean {stats['mean_ms']:7.3f}ms  p95 {stats['p95_ms']:7.3f}ms  max {stats['max_ms']:7.3f}ms"
+            for name, stats in sorted(summary['phases'].items())
+        ]
+        lines += [f'{name:<24} {value}' for name, value in sorted(summary['counters'].items())]
+        return '\n'.join(lines)
+
+    def export_trace(self, path: str):
+        """
+        Write the recorded events in the Chrome trace event format,
+        which can be opened in chrome://tracing or ui.perfetto.dev
+        """
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': list(self.trace_events), 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,98 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+import numpy as np
+
+from chunked_world import ChunkedLevel
+from engine import Engine, GameStatus, StepResult
+from level import Level
+
+
+def level_seed(seed: int, index: int) -> int:
+    """
+    :param seed: seed of the whole progression
+    :param index: position of the level in the progression, starting at 0
+    :return: seed of the level, independent of the seeds of all other levels
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(1)[0])
+
+
+class LevelProgression:
+    """
+    Levels played one after another on the same engine: a won level is followed by
+    the next one, a lost level is played again. The next level is generated on a
+    background thread while the current one is played, so that switching levels
+    never waits for the maze generation.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        seed: int,
+        level_factory: Callable[[int], Level] = None,
+        prefetch=True
+    ):
+        """
+        :param seed: seed of the whole progression, see level_seed
+        :param level_factory: generates a level from its seed, Engine.build_level if None.
+            Runs on the background thread, so it must not change any shared state.
+        :param prefetch: if False, every level is generated when it is needed
+        """
+        self.engine = engine
+        self.seed = seed
+        self.level_factory = level_factory if level_factory is not None else engine.build_level
+        """position of the current level in the progression"""
+        self.index = 0
+        self.pending: Future = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='levels') if prefetch else None
+
+    @property
+    def level_seed(self) -> int:
+        """seed of the current level"""
+        return level_seed(self.seed, self.index)
+
+    def start(self) -> StepResult:
+        """
+        Start the first level, generated right away
+
+        :return: the initial state
+        """
+        return self.play(self.level_factory(self.level_seed))
+
+    def next(self, status: GameStatus) -> StepResult:
+        """
+        Go on after the current level has ended
+
+        :param status: how the current level ended, the next level is started if Won,
+            the current one again otherwise
+        :return: the initial state
+        """
+        if status != GameStatus.Won:
+            return self.play(self.engine.level)
+
+        previous = self.engine.level
+        self.index += 1
+        if self.pending is not None:
+            level = self.pending.result()
+            self.pending = None
+        else:
+            level = self.level_factory(self.level_seed)
+        if isinstance(previous, ChunkedLevel):
+            previous.close()
+        return self.play(level)
+
+    def play(self, level) -> StepResult:
+        """start the level on the engine and prefetch the one after it"""
+        state = self.engine.start(level)
+        if self.executor is not None and self.pending is None:
+            self.pending = self.executor.submit(self.level_factory, level_seed(self.seed, self.index + 1))
+        return state
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        levels = [self.engine.level]
+        if self.pending is not None and self.pending.done() and not self.pending.cancelled():
+            levels.append(self.pending.result())
+        for level in levels:
+            if isinstance(level, ChunkedLevel):
+                level.close()
@@ -0,0 +1,153 @@
+import numpy as np
+
+from maze import WALL_LEFT, WALL_UP
+from obstacle_store import ScanResult, closest_per_direction
+from player import Player
+
+
+"""directions of a step from a cell to its neighbour, the last axis of blocking_table"""
+UP, DOWN, LEFT, RIGHT = range(4)
+
+
+def blocking_table(walls: np.ndarray) -> np.ndarray:
+    """
+    :param walls: uint8 array of shape (width, height) holding WALL_UP and WALL_LEFT bits per cell
+    :return: boolean array of shape (width + 2, height + 2, 4), True where a step from a cell in
+        the direction UP, DOWN, LEFT or RIGHT is blocked by a wall. The maze is padded by one cell
+        on each side, every step leaving the maze is blocked.
+    """
+    width, height = walls.shape
+    padded = np.full((width + 2, height + 2), WALL_UP | WALL_LEFT, dtype=np.uint8)
+    padded[1:-1, 1:-1] = walls
+    outside = np.ones((width + 2, height + 2), dtype=bool)
+    outside[1:-1, 1:-1] = False
+    wall_up = (padded & WALL_UP) != 0
+    wall_left = (padded & WALL_LEFT) != 0
+
+    blocked = np.ones((width + 2, height + 2, 4), dtype=bool)
+    blocked[:, 1:, UP] = wall_up[:, 1:] | outside[:, :-1]
+    blocked[:, :-1, DOWN] = wall_up[:, 1:] | outside[:, 1:]
+    blocked[1:, :, LEFT] = wall_left[1:, :] | outside[:-1, :]
+    blocked[:-1, :, RIGHT] = wall_left[1:, :] | outside[1:, :]
+    return blocked
+
+
+def cast_rays(
+    blocked: np.ndarray,
+    cell_width: float, cell_height: float,
+    x: float, y: float,
+    rads: np.ndarray,
+    max_distance: float
+) -> (np.ndarray, int):
+    """
+    March rays through the maze grid cell by cell (DDA), batched across all rays and
+    all cell borders within reach: every ray can cross at most a fixed number of vertical
+    and horizontal borders within max_distance, so all of them are computed up front,
+    sorted into the order the ray crosses them and tested against the walls at once.
+    The cost only depends on the number of rays and the cells they can cross.
+
+    :param blocked: walls of the maze, see blocking_table
+    :param x: x-coordinate of the origin of the rays, within the maze
+    :param y: y-coordinate of the origin of the rays, within the maze
+    :param rads: direction of every ray in radians
+    :param max_distance: rays are only followed this far
+    :return: distance along every ray to the first wall it hits, inf if none within
+        max_distance, and the number of cell borders tested
+    """
+    width, height = blocked.shape[0] - 2, blocked.shape[1] - 2
+    rays = np.arange(len(rads))
+
+    """flip y-coordinate system because pixel coordinate system is upside down"""
+    dx = np.cos(rads)
+    dy = -np.sin(rads)
+    positive_x = dx > 0
+    positive_y = dy > 0
+    cell_x = min(max(int(x // cell_width), 0), width - 1)
+    cell_y = min(max(int(y // cell_height), 0), height - 1)
+
+    """
+    distance along each ray to every vertical and horizontal cell border it can reach;
+    rays parallel to an axis reach the borders across it only after an enormous distance
+    """
+    gap_x = np.maximum(np.where(positive_x, (cell_x + 1) * cell_width - x, x - cell_x * cell_width), 0)
+    gap_y = np.maximum(np.where(positive_y, (cell_y + 1) * cell_height - y, y - cell_y * cell_height), 0)
+    borders_x = np.arange(int(max_distance // cell_width) + 1) * cell_width
+    borders_y = np.arange(int(max_distance // cell_height) + 1) * cell_height
+    crossings = np.concatenate([
+        (gap_x[:, None] + borders_x) / np.maximum(np.abs(dx), 1e-12)[:, None],
+        (gap_y[:, None] + borders_y) / np.maximum(np.abs(dy), 1e-12)[:, None],
+    ], axis=1)
+
+    """
+    walk the crossings in order, each one is a step to the neighbouring cell. Steps are
+    offsets into the flattened blocking table, which also selects the direction of the step.
+    """
+    order = np.argsort(crossings, axis=1, kind='stable')
+    distances = crossings[rays[:, None], order]
+    crosses_x = order < len(borders_x)
+    stride_x = (height + 2) * 4
+    moves = np.where(
+        crosses_x,
+        np.where(positive_x, stride_x, -stride_x)[:, None],
+        np.where(positive_y, 4, -4)[:, None]
+    )
+    """RIGHT or LEFT, DOWN or UP"""
+    directions = np.where(crosses_x, (positive_x + LEFT)[:, None], (positive_y + UP)[:, None])
+    start = ((cell_x + 1) * (height + 2) + cell_y + 1) * 4
+    """entries of the cells before each step; steps past a wall never matter but must stay in the table"""
+    entries = np.cumsum(moves, axis=1) - moves + directions + start
+    entries = np.minimum(np.maximum(entries, 0), blocked.size - 1)
+
+    hits = blocked.reshape(-1)[entries] & (distances <= max_distance)
+    first = hits.argmax(axis=1)
+    return np.where(hits[rays, first], distances[rays, first], np.inf), hits.size
+
+
+class RayScanner:
+    """
+    Scans the surroundings by casting rays evenly spread across the viewing bounds
+    through the walls of the maze grid. Unlike the obstacle scans, walls hidden
+    behind other walls are never heard, and the cost does not depend on the number
+    of obstacles. Obstacles are not marked in sight.
+    """
+
+    def __init__(self, walls: np.ndarray, cell_width: float, cell_height: float, ray_count: int):
+        """
+        :param walls: uint8 array of shape (width, height) holding WALL_UP and WALL_LEFT bits per cell
+        :param ray_count: number of rays, a multiple of 3 gives every section of the frustum as many rays
+        """
+        self.blocked = blocking_table(walls)
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        """every ray runs through the middle of its share of the viewing bounds, as a fraction of the viewing angle"""
+        self.fractions = (np.arange(ray_count) + 0.5) / ray_count
+        """angle and distance per ray of the last scan, inf if the ray hit nothing"""
+        self.rads = np.empty(0)
+        self.distances = np.empty(0)
+
+    def scan(self, player: Player) -> ScanResult:
+        """
+        :return: whether the player collided and the closest wall hit per direction,
+            tested is the number of cell borders tested
+        """
+        frustum = player.frustum()
+        viewing_angle = 2 * player.viewing_sector.angle.rad
+        self.rads = (frustum.lower_bound.rad + self.fractions * viewing_angle) % (2 * np.pi)
+        self.distances, tested = cast_rays(
+            self.blocked,
+            self.cell_width, self.cell_height,
+            frustum.x, frustum.y,
+            self.rads,
+            frustum.radius
+        )
+        hit = np.isfinite(self.distances)
+        return closest_per_direction(player, self.rads[hit], self.distances[hit], tested)
+
+    def sources_in_sight(self, player: Player) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        Rays of the last scan which hit a wall, as sound sources keyed by the index of the ray
+
+        :return: key, angle and distance relative to the player per ray hitting a wall
+        """
+        keys = np.flatnonzero(np.isfinite(self.distances))
+        return keys, self.rads[keys], self.distances[keys]
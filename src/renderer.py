@@ -0,0 +1,206 @@
+from typing import List
+import numpy as np
+import pygame.display
+import pygame.draw
+
+from level import Level, Obstacle
+from math_utils import PolarCoordinate, Position
+from player import Player
+
+
+def draw_player(surface: pygame.Surface, player: Player) -> List[pygame.Rect]:
+    """
+    Draw the player and its viewing frustum
+
+    :return: the areas drawn to
+    """
+    frustum_radius = player.viewing_sector.radius
+    offset_angle = player.viewing_sector.angle
+    arc_start = player.direction - offset_angle
+
+    body = pygame.draw.circle(
+        surface,
+        Player.COLOR,
+        player.position,
+        Player.BODY_RADIUS
+    )
+
+    arc = pygame.draw.arc(
+        surface,
+        Player.FRUSTUM_COLOR,
+        (
+            player.position.x - frustum_radius,
+            player.position.y - frustum_radius,
+            2 * frustum_radius,
+            2 * frustum_radius
+        ),
+        arc_start.rad, (arc_start + offset_angle * 2).rad,
+        1
+    )
+
+    arc_start_coordinate = PolarCoordinate(arc_start, frustum_radius)
+    arc_end_coordinate = PolarCoordinate(arc_start + offset_angle * 2, frustum_radius)
+    arc_start_world_coordinate = player.relative_polar_coordinate_to_world_position(arc_start_coordinate)
+    arc_end_world_coordinate = player.relative_polar_coordinate_to_world_position(arc_end_coordinate)
+
+    start_line = pygame.draw.line(
+        surface,
+        Player.FRUSTUM_COLOR,
+        (player.position.x, player.position.y),
+        (arc_start_world_coordinate.x, arc_start_world_coordinate.y)
+    )
+
+    end_line = pygame.draw.line(
+        surface,
+        Player.FRUSTUM_COLOR,
+        (player.position.x, player.position.y),
+        (arc_end_world_coordinate.x, arc_end_world_coordinate.y)
+    )
+    return [body, arc, start_line, end_line]
+
+
+def draw_obstacle(surface: pygame.Surface, level: Level, index: int, in_sight: bool) -> pygame.Rect:
+    store = level.obstacle_store
+    return pygame.draw.circle(
+        surface,
+        Obstacle.DEFAULT_COLOR_IN_SIGHT if in_sight else Obstacle.DEFAULT_COLOR,
+        (store.x[index], store.y[index]),
+        Obstacle.DEFAULT_RADIUS
+    )
+
+
+def draw_segment(surface: pygame.Surface, level: Level, index: int, in_sight: bool) -> pygame.Rect:
+    segments = level.wall_segments
+    return pygame.draw.line(
+        surface,
+        Obstacle.DEFAULT_COLOR_IN_SIGHT if in_sight else Obstacle.DEFAULT_COLOR,
+        (segments.x0[index], segments.y0[index]),
+        (segments.x1[index], segments.y1[index]),
+        2 * Obstacle.DEFAULT_RADIUS
+    )
+
+
+def draw_objects(surface: pygame.Surface, level: Level, use_sight=True):
+    """
+    Draw all walls and the target
+
+    :param use_sight: if False, every wall is drawn as out of sight
+    """
+    for i, in_sight in enumerate(level.wall_segments.in_sight):
+        draw_segment(surface, level, i, use_sight and in_sight)
+
+    for i, in_sight in enumerate(level.obstacle_store.in_sight):
+        draw_obstacle(surface, level, i, use_sight and in_sight)
+
+    pygame.draw.circle(
+        surface,
+        Level.TARGET_COLOR,
+        level.target,
+        Level.TARGET_RADIUS
+    )
+
+
+class DirtyRectRenderer:
+    """
+    Draws the maze once into an off-screen layer. Every frame only the player,
+    its frustum and the walls in sight are redrawn, and only the areas changed
+    since the last frame are pushed to the display.
+    """
+
+    def __init__(
+        self,
+        screen: pygame.Surface,
+        level: Level,
+        starting_pos,
+        text: pygame.Surface,
+        background_color,
+        starting_pos_color
+    ):
+        self.screen = screen
+        self.level = level
+        self.static_layer = pygame.Surface(screen.get_size())
+
+        self.static_layer.fill(background_color)
+        pygame.draw.circle(self.static_layer, starting_pos_color, starting_pos, Player.BODY_RADIUS)
+        draw_objects(self.static_layer, level, use_sight=False)
+        self.static_layer.blit(text, (20, 20))
+
+        self.previous_rects: List[pygame.Rect] = []
+        self.is_first_frame = True
+
+    def render(self, player: Player):
+        if self.is_first_frame:
+            self.screen.blit(self.static_layer, (0, 0))
+
+        """
+        restoring last frame's player, frustum and highlighted walls from the
+        static layer also resets walls which went out of sight since
+        """
+        dirty_rects = self.previous_rects
+        for rect in dirty_rects:
+            self.screen.blit(self.static_layer, rect, rect)
+
+        current_rects = []
+        for i in self.level.obstacle_store.visible_indices:
+            current_rects.append(draw_obstacle(self.screen, self.level, i, True))
+        for i in np.flatnonzero(self.level.wall_segments.in_sight):
+            current_rects.append(draw_segment(self.screen, self.level, i, True))
+        current_rects += draw_player(self.screen, player)
+
+        if self.is_first_frame:
+            pygame.display.flip()
+            self.is_first_frame = False
+        else:
+            pygame.display.update(dirty_rects + current_rects)
+        self.previous_rects = current_rects
+
+
+class CameraRenderer:
+    """
+    Draws a chunked level around the player, who stays in the middle of the screen.
+    Only the resident chunks are drawn, the whole screen is redrawn every frame.
+    """
+
+    def __init__(self, screen: pygame.Surface, level, text: pygame.Surface, background_color):
+        """
+        :param level: a chunked_world.ChunkedLevel
+        """
+        self.screen = screen
+        self.level = level
+        self.text = text
+        self.background_color = background_color
+
+    def render(self, player: Player):
+        width, height = self.screen.get_size()
+        offset = Position(player.position.x - width / 2, player.position.y - height / 2)
+
+        self.screen.fill(self.background_color)
+        extent = self.level.chunks.chunk_extent
+        for chunk in self.level.resident:
+            left = chunk.key[0] * extent - offset.x
+            top = chunk.key[1] * extent - offset.y
+            if left < width and top < height and left + extent > 0 and top + extent > 0:
+                self.draw_segments(chunk.segments, offset)
+        self.draw_segments(self.level.wall_segments, offset, in_sight_only=True)
+
+        pygame.draw.circle(self.screen, Level.TARGET_COLOR, self.level.target - offset, Level.TARGET_RADIUS)
+        draw_player(
+            self.screen,
+            Player(player.position - offset, player.direction, player.screen_dimensions, player.viewing_sector)
+        )
+        self.screen.blit(self.text, (20, 20))
+        pygame.display.flip()
+
+    def draw_segments(self, segments, offset: Position, in_sight_only=False):
+        """
+        :param in_sight_only: if True, only the segments in sight are drawn, highlighted
+        """
+        indices = np.flatnonzero(segments.in_sight) if in_sight_only else range(len(segments))
+        for i in indices:
+            pygame.draw.line(
+                self.screen,
+                Obstacle.DEFAULT_COLOR_IN_SIGHT if in_sight_only else Obstacle.DEFAULT_COLOR,
+                (segments.x0[i] - offset.x, segments.y0[i] - offset.y),
+                (segments.x1[i] - offset.x, segments.y1[i] - offset.y),
+                2 * Obstacle.DEFAULT_RADIUS
+            )
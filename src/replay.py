@@ -0,0 +1,208 @@
+import argparse
+import json
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List
+
+from chunked_world import ChunkCache, ChunkedLevel
+from controls import Controls
+from engine import Engine, GameStatus, StepResult
+from level import Geometry
+from maze import MazeAlgorithm
+from profiler import FrameProfiler
+
+"""
+A recording is a header line of JSON followed by the zlib compressed control
+stream, one byte of CONTROL_BITS flags per simulation step.
+"""
+MAGIC = b'HPREC1\n'
+CONTROL_BITS = {'forward': 1, 'left': 2, 'right': 4}
+
+
+def encode_controls(controls: Controls) -> int:
+    return (
+        controls.forward * CONTROL_BITS['forward']
+        | controls.left * CONTROL_BITS['left']
+        | controls.right * CONTROL_BITS['right']
+    )
+
+
+def decode_controls(flags: int) -> Controls:
+    return Controls(
+        forward=bool(flags & CONTROL_BITS['forward']),
+        left=bool(flags & CONTROL_BITS['left']),
+        right=bool(flags & CONTROL_BITS['right'])
+    )
+
+
+@dataclass
+class Recording:
+    """everything needed to play a session again, step by step"""
+    seed: int
+    maze_dimensions: (int, int)
+    screen_dimensions: (int, int)
+    geometry: Geometry
+    distance_field_resolution: float
+    tick_ms: float
+    """CONTROL_BITS flags of every step"""
+    controls: bytes
+    """state after the last step, as (x, y, direction in radians, status name)"""
+    final_state: tuple
+    """True if played on a chunked_world.ChunkedLevel"""
+    chunked: bool = False
+    maze_algorithm: MazeAlgorithm = MazeAlgorithm.DFS
+
+    def save(self, path: str):
+        header = {
+            'seed': self.seed,
+            'maze_dimensions': list(self.maze_dimensions),
+            'screen_dimensions': list(self.screen_dimensions),
+            'geometry': self.geometry.name,
+            'distance_field_resolution': self.distance_field_resolution,
+            'tick_ms': self.tick_ms,
+            'steps': len(self.controls),
+            'final_state': list(self.final_state),
+            'chunked': self.chunked,
+            'maze_algorithm': self.maze_algorithm.name,
+        }
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(json.dumps(header).encode() + b'\n')
+            file.write(zlib.compress(self.controls, 9))
+
+    @staticmethod
+    def load(path: str) -> 'Recording':
+        with open(path, 'rb') as file:
+            if file.readline() != MAGIC:
+                raise ValueError(f'{path} is not a recording')
+            header = json.loads(file.readline())
+            controls = zlib.decompress(file.read())
+
+        if len(controls) != header['steps']:
+            raise ValueError(f"{path} holds {len(controls)} steps instead of {header['steps']}")
+        return Recording(
+            header['seed'],
+            tuple(header['maze_dimensions']),
+            tuple(header['screen_dimensions']),
+            Geometry[header['geometry']],
+            header['distance_field_resolution'],
+            header['tick_ms'],
+            controls,
+            tuple(header['final_state']),
+            header.get('chunked', False),
+            MazeAlgorithm[header.get('maze_algorithm', MazeAlgorithm.DFS.name)]
+        )
+
+
+def final_state(state: StepResult) -> tuple:
+    return state.position.x, state.position.y, state.direction.rad, state.status.name
+
+
+class InputRecorder:
+    """
+    Collects the controls of every step of an Engine, see Engine.recorder.
+    The engine must have been reset with a seed and be advanced in steps of its tick_ms.
+    """
+
+    def __init__(self, engine: Engine, seed: int):
+        """
+        :param seed: seed the engine has been reset with
+        """
+        self.engine = engine
+        self.seed = seed
+        self.controls = bytearray()
+
+    def record(self, controls: Controls):
+        self.controls.append(encode_controls(controls))
+
+    def recording(self) -> Recording:
+        engine = self.engine
+        return Recording(
+            self.seed,
+            engine.maze_dimensions,
+            engine.screen_dimensions,
+            engine.geometry,
+            engine.distance_field_resolution,
+            engine.tick_ms,
+            bytes(self.controls),
+            final_state(engine.result()),
+            isinstance(engine.level, ChunkedLevel),
+            engine.maze_algorithm
+        )
+
+    def save(self, path: str):
+        self.recording().save(path)
+
+
+@dataclass
+class ReplayResult:
+    steps: int
+    final_state: tuple
+    """True if the replay ended in the recorded state"""
+    matches: bool
+    """wall clock time of the replay in seconds, excluding level generation"""
+    wall_time: float
+
+
+def replay(recording: Recording, profiler: FrameProfiler = None) -> ReplayResult:
+    """
+    Play a recording again headless, as fast as possible
+
+    :param profiler: if enabled, every step is profiled as one frame
+    """
+    profiler = profiler if profiler is not None else FrameProfiler()
+    engine = Engine(
+        recording.screen_dimensions,
+        recording.maze_dimensions,
+        recording.geometry,
+        profiler=profiler,
+        distance_field_resolution=recording.distance_field_resolution,
+        tick_ms=recording.tick_ms,
+        maze_algorithm=recording.maze_algorithm
+    )
+    if recording.chunked:
+        state = engine.start(ChunkedLevel(recording.seed, ChunkCache(recording.seed, prefetch=False)))
+    else:
+        state = engine.reset(recording.seed)
+
+    controls: List[Controls] = [decode_controls(flags) for flags in range(max(CONTROL_BITS.values()) * 2)]
+    start = time.perf_counter()
+    for flags in recording.controls:
+        profiler.begin_frame()
+        state = engine.step(controls[flags], recording.tick_ms)
+        profiler.end_frame()
+    wall_time = time.perf_counter() - start
+
+    replayed = final_state(state)
+    return ReplayResult(len(recording.controls), replayed, replayed == recording.final_state, wall_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded session headless and verify its outcome')
+    parser.add_argument('recording')
+    parser.add_argument('--trace', default=None, help='write a Chrome trace of the replay to this file')
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    profiler = FrameProfiler(enabled=args.trace is not None)
+    result = replay(recording, profiler)
+
+    simulated_seconds = result.steps * recording.tick_ms / 1000
+    print(
+        f'{result.steps} steps in {result.wall_time:.3f}s '
+        f'({simulated_seconds / max(result.wall_time, 1e-9):.0f}x real time)'
+    )
+    if args.trace is not None:
+        profiler.export_trace(args.trace)
+        print(profiler.format_summary())
+
+    if not result.matches:
+        print(f'final state {result.final_state} differs from the recorded {recording.final_state}')
+        sys.exit(1)
+    print(f'final state matches: {GameStatus[result.final_state[3]].name}')
+
+
+if __name__ == "__main__":
+    main()
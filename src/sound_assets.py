@@ -0,0 +1,120 @@
+import hashlib
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable
+import pygame.mixer
+
+ASSET_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets')
+DEFAULT_PCM_CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.sound_cache')
+
+
+def asset_path(name: str) -> str:
+    """
+    :param name: file name within the assets directory, or an absolute path
+    :return: path of the asset, independent of the working directory
+    """
+    return name if os.path.isabs(name) else os.path.join(ASSET_DIRECTORY, name)
+
+
+@dataclass
+class LoadTime:
+    """how long loading an asset took and where it was loaded from"""
+    seconds: float
+    """'decoded' from the original file or read from the 'pcm cache'"""
+    source: str
+
+
+class SoundAssets:
+    """
+    Sounds decoded once and kept in memory, so that playing them never touches the disk.
+    Decoding can happen on a background thread while the game starts. Optionally the
+    decoded PCM is cached on disk, which saves decoding the files on the next launch.
+    The mixer has to be initialized before any sound is loaded.
+    """
+
+    def __init__(self, pcm_cache_directory: str = DEFAULT_PCM_CACHE_DIRECTORY):
+        """
+        :param pcm_cache_directory: directory for decoded PCM, nothing is cached on disk if None
+        """
+        self.pcm_cache_directory = pcm_cache_directory
+        self.sounds: Dict[str, pygame.mixer.Sound] = {}
+        self.pending: Dict[str, Future] = {}
+        self.load_times: Dict[str, LoadTime] = {}
+        self.executor: ThreadPoolExecutor = None
+
+    def preload(self, names: Iterable[str], background=True):
+        """
+        Load sounds ahead of their first use
+
+        :param background: if True, return immediately and load the sounds on a background thread
+        """
+        names = [name for name in names if name not in self.sounds and name not in self.pending]
+        if not background:
+            for name in names:
+                self.sounds[name] = self.load(name)
+            return
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sound_assets')
+        for name in names:
+            self.pending[name] = self.executor.submit(self.load, name)
+
+    def get(self, name: str) -> pygame.mixer.Sound:
+        """
+        :return: the decoded sound, waiting for its preload or loading it right away if necessary
+        """
+        sound = self.sounds.get(name)
+        if sound is not None:
+            return sound
+
+        future = self.pending.pop(name, None)
+        sound = future.result() if future is not None else self.load(name)
+        self.sounds[name] = sound
+        return sound
+
+    def load(self, name: str) -> pygame.mixer.Sound:
+        start = time.perf_counter()
+        path = asset_path(name)
+        cache_path = self.pcm_cache_path(path)
+
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as file:
+                sound = pygame.mixer.Sound(buffer=file.read())
+            source = 'pcm cache'
+        else:
+            sound = pygame.mixer.Sound(path)
+            if cache_path is not None:
+                self.store_pcm(cache_path, sound)
+            source = 'decoded'
+
+        self.load_times[name] = LoadTime(time.perf_counter() - start, source)
+        return sound
+
+    def pcm_cache_path(self, path: str) -> str:
+        """
+        :return: cache file of the decoded asset, keyed by the asset's size and modification
+            time and the format of the mixer, None if there is no cache directory
+        """
+        if self.pcm_cache_directory is None:
+            return None
+        stat = os.stat(path)
+        description = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{pygame.mixer.get_init()}'
+        key = hashlib.sha256(description.encode()).hexdigest()[:24]
+        return os.path.join(self.pcm_cache_directory, f'{os.path.basename(path)}.{key}.pcm')
+
+    @staticmethod
+    def store_pcm(cache_path: str, sound: pygame.mixer.Sound):
+        """write atomically, so that a concurrent launch never reads half a file"""
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f'{cache_path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(sound.get_raw())
+        os.replace(temporary, cache_path)
+
+    def format_load_times(self) -> str:
+        return '\n'.join(
+            f'{name:<24} {load_time.seconds * 1000:8.2f}ms  {load_time.source}'
+            for name, load_time in sorted(self.load_times.items())
+        )
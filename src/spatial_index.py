@@ -0,0 +1,70 @@
+import numpy as np
+
+from player import Player
+
+
+class SpatialHash:
+    """
+    Uniform grid over the obstacles of a level, one bucket per maze cell.
+    Buckets are stored column by column in a flat index array, so all buckets
+    of one column within a row range form a single contiguous slice.
+    """
+
+    def __init__(
+        self,
+        cell_width: float, cell_height: float,
+        indices: np.ndarray, offsets: np.ndarray,
+        num_columns: int, num_rows: int
+    ):
+        """
+        :param indices: obstacle indices sorted by bucket
+        :param offsets: offsets[b]:offsets[b + 1] are the positions in indices of the obstacles of bucket b
+        """
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.indices = indices
+        self.offsets = offsets
+        self.num_columns = num_columns
+        self.num_rows = num_rows
+
+    @staticmethod
+    def build(cell_width: float, cell_height: float, xs: np.ndarray, ys: np.ndarray) -> 'SpatialHash':
+        columns = np.floor(np.asarray(xs) / cell_width).astype(np.int64)
+        rows = np.floor(np.asarray(ys) / cell_height).astype(np.int64)
+        num_columns = int(columns.max()) + 1 if columns.size else 0
+        num_rows = int(rows.max()) + 1 if rows.size else 0
+
+        bucket_ids = columns * num_rows + rows
+        indices = np.argsort(bucket_ids, kind='stable')
+        offsets = np.searchsorted(bucket_ids[indices], np.arange(num_columns * num_rows + 1))
+        return SpatialHash(cell_width, cell_height, indices, offsets, num_columns, num_rows)
+
+    def candidates_in_box(self, x_min, y_min, x_max, y_max) -> np.ndarray:
+        """
+        :return: indices of all obstacles in buckets overlapping the given box
+        """
+        column_start = max(int(np.floor(x_min / self.cell_width)), 0)
+        column_end = min(int(np.floor(x_max / self.cell_width)), self.num_columns - 1)
+        row_start = max(int(np.floor(y_min / self.cell_height)), 0)
+        row_end = min(int(np.floor(y_max / self.cell_height)), self.num_rows - 1)
+
+        if column_start > column_end or row_start > row_end:
+            return np.empty(0, dtype=np.int64)
+
+        slices = [
+            self.indices[
+                self.offsets[column * self.num_rows + row_start]:
+                self.offsets[column * self.num_rows + row_end + 1]
+            ]
+            for column in range(column_start, column_end + 1)
+        ]
+        return np.concatenate(slices)
+
+    def sector_candidates(self, player: Player) -> np.ndarray:
+        """
+        Find all obstacles in buckets overlapping the player's viewing frustum.
+        Whether they are actually in sight still has to be checked.
+
+        :return: indices of the candidate obstacles
+        """
+        return self.candidates_in_box(*player.frustum().bounding_box)
@@ -0,0 +1,190 @@
+import threading
+import numpy as np
+import pygame.mixer
+import pygame.sndarray
+
+
+class SpatialMixer:
+    """
+    Software mixer synthesizing many positioned tones at once, block by block.
+    Every source is identified by a key, e.g. the index of a wall, and plays a tone
+    of its own frequency, optionally beeping. Gain and panning of a source are
+    ramped linearly over a block towards the values of the last update, so that
+    changes never click. At most MAX_VOICES sources are played, the loudest ones,
+    which bounds the cost of a block regardless of the number of sources.
+    Blocks are queued from a background thread, see start, so that a slow frame
+    of the game does not interrupt the audio.
+    """
+    SAMPLE_RATE = 44100
+    BLOCK_SIZE = 1024
+    MAX_VOICES = 256
+    """the gains of all sources together are scaled down to stay below this"""
+    MAX_TOTAL_GAIN = 0.3
+    """a beeping source is on for BEEP_LENGTH out of every BEEP_PERIOD samples"""
+    BEEP_LENGTH = 5000
+    BEEP_PERIOD = 44100
+    """mixer channel reserved for the stream, so that clips never take it over"""
+    CHANNEL = 0
+    """how often the queue is checked for room for the next block, per block"""
+    POLLS_PER_BLOCK = 4
+
+    def __init__(self, sample_rate=SAMPLE_RATE, block_size=BLOCK_SIZE, max_voices=MAX_VOICES):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.max_voices = max_voices
+        self.offsets = np.arange(block_size, dtype=np.float32)
+        """position of every sample of a block within the block, from 0 to 1"""
+        self.ramp = self.offsets / block_size
+        self.sample_clock = 0
+
+        """one entry per voice, key -1 marks a free voice"""
+        self.keys = np.full(max_voices, -1, dtype=np.int64)
+        """phase advanced per sample and the phase at the start of the next block, in radians"""
+        self.increments = np.zeros(max_voices)
+        self.phases = np.zeros(max_voices)
+        self.beeping = np.zeros(max_voices, dtype=bool)
+        self.gains = np.zeros(max_voices)
+        self.target_gains = np.zeros(max_voices)
+        self.pannings = np.full(max_voices, 0.5)
+        self.target_pannings = np.full(max_voices, 0.5)
+
+        self.channel: pygame.mixer.Channel = None
+        """guards the voices, which are updated by the game and rendered by the feeder thread"""
+        self.lock = threading.Lock()
+        self.feeder: threading.Thread = None
+        self.stopped = threading.Event()
+
+    def update(self, keys: np.ndarray, frequencies, gains: np.ndarray, pannings: np.ndarray, beeping=False):
+        """
+        Set the sources to play from now on. Sources not given any more fade out,
+        new sources fade in.
+
+        :param keys: non-negative key per source, a source keeps its voice as long as its key is given
+        :param frequencies: frequency per source or one for all
+        :param gains: target gain per source
+        :param pannings: target panning per source, 0 is left and 1 is right
+        :param beeping: whether the source beeps, per source or one for all
+        """
+        with self.lock:
+            keys = np.asarray(keys, dtype=np.int64)
+            gains = np.asarray(gains, dtype=np.float64)
+            pannings = np.asarray(pannings, dtype=np.float64)
+            frequencies = np.broadcast_to(np.asarray(frequencies, dtype=np.float64), keys.shape)
+            beeping = np.broadcast_to(np.asarray(beeping, dtype=bool), keys.shape)
+
+            if len(keys) > self.max_voices:
+                loudest = np.argpartition(gains, -self.max_voices)[-self.max_voices:]
+                keys, gains, pannings = keys[loudest], gains[loudest], pannings[loudest]
+                frequencies, beeping = frequencies[loudest], beeping[loudest]
+
+            total_gain = gains.sum()
+            if total_gain > SpatialMixer.MAX_TOTAL_GAIN:
+                gains = gains * (SpatialMixer.MAX_TOTAL_GAIN / total_gain)
+
+            """voices of sources which are not given any more fade out"""
+            playing = self.keys >= 0
+            kept = playing & np.isin(self.keys, keys)
+            self.target_gains[playing & ~kept] = 0
+
+            """sources which already have a voice keep it"""
+            order = np.argsort(keys)
+            positions = np.searchsorted(keys[order], self.keys[kept])
+            sources = order[positions]
+            self.target_gains[kept] = gains[sources]
+            self.target_pannings[kept] = pannings[sources]
+
+            """new sources get free voices, starting silent"""
+            new = np.ones(len(keys), dtype=bool)
+            new[sources] = False
+            new = np.flatnonzero(new)
+            free = np.flatnonzero(~playing)
+            if len(new) > len(free):
+                new = new[np.argsort(gains[new])[len(new) - len(free):]]
+            voices = free[:len(new)]
+            self.keys[voices] = keys[new]
+            self.increments[voices] = 2 * np.pi * frequencies[new] / self.sample_rate
+            self.phases[voices] = 0
+            self.beeping[voices] = beeping[new]
+            self.gains[voices] = 0
+            self.target_gains[voices] = gains[new]
+            self.pannings[voices] = pannings[new]
+            self.target_pannings[voices] = pannings[new]
+
+    def silence(self):
+        """fade out all sources"""
+        self.update(np.empty(0, dtype=np.int64), 0, np.empty(0), np.empty(0))
+
+    def render_block(self) -> np.ndarray:
+        """
+        Synthesize the next block of all voices and mix it down to stereo
+
+        :return: float32 array of shape (BLOCK_SIZE, 2)
+        """
+        voices = np.flatnonzero(self.keys >= 0)
+        block = np.zeros((self.block_size, 2), dtype=np.float32)
+        if len(voices) == 0:
+            self.sample_clock += self.block_size
+            return block
+
+        """samples of all voices at once in single precision, shape (voices, BLOCK_SIZE)"""
+        samples = np.multiply.outer(self.increments[voices].astype(np.float32), self.offsets)
+        samples += self.phases[voices, None].astype(np.float32)
+        np.sin(samples, out=samples)
+        if self.beeping[voices].any():
+            clock = (self.sample_clock + np.arange(self.block_size)) % SpatialMixer.BEEP_PERIOD
+            gate = clock < SpatialMixer.BEEP_LENGTH
+            samples[self.beeping[voices]] *= gate
+
+        """weights of each voice per channel at the start and the end of the block"""
+        gains, target_gains = self.gains[voices], self.target_gains[voices]
+        pannings, target_pannings = self.pannings[voices], self.target_pannings[voices]
+        start = np.stack([gains * (1 - pannings), gains * pannings]).astype(np.float32)
+        end = np.stack([target_gains * (1 - target_pannings), target_gains * target_pannings]).astype(np.float32)
+
+        """linear ramps from start to end, applied after summing over the voices"""
+        mixed_start = start @ samples
+        mixed_change = (end - start) @ samples
+        block[:] = (mixed_start + mixed_change * self.ramp).T
+
+        self.phases[voices] = (self.phases[voices] + self.increments[voices] * self.block_size) % (2 * np.pi)
+        self.gains[voices] = target_gains
+        self.pannings[voices] = target_pannings
+        self.sample_clock += self.block_size
+
+        """voices which have faded out are free again"""
+        self.keys[voices[target_gains == 0]] = -1
+        return block
+
+    def start(self):
+        """
+        Start playing on the reserved channel CHANNEL and keep its queue supplied from a
+        background thread, independently of the frame rate.
+        The mixer has to be initialized for float32 stereo at SAMPLE_RATE.
+        """
+        pygame.mixer.set_reserved(SpatialMixer.CHANNEL + 1)
+        self.channel = pygame.mixer.Channel(SpatialMixer.CHANNEL)
+        self.channel.play(self.next_sound())
+        self.stopped.clear()
+        self.feeder = threading.Thread(target=self.feed, name='spatial-mixer', daemon=True)
+        self.feeder.start()
+
+    def feed(self):
+        """queue the next block whenever the queue has room, until close"""
+        poll_seconds = self.block_size / self.sample_rate / SpatialMixer.POLLS_PER_BLOCK
+        while not self.stopped.wait(poll_seconds):
+            if self.channel.get_queue() is None:
+                self.channel.queue(self.next_sound())
+
+    def next_sound(self) -> pygame.mixer.Sound:
+        with self.lock:
+            block = self.render_block()
+        return pygame.sndarray.make_sound(block)
+
+    def close(self):
+        """stop the feeder thread and the stream, before the mixer is shut down"""
+        self.stopped.set()
+        if self.feeder is not None:
+            self.feeder.join()
+            self.feeder = None
+        if self.channel is not None:
+            self.channel.stop()
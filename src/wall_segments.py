@@ -0,0 +1,249 @@
+import numpy as np
+
+from math_utils import Angle
+from obstacle_store import ScanResult
+from player import Player
+from spatial_index import SpatialHash
+
+
+class WallSegments:
+    """
+    Walls of a level as merged axis-aligned line segments, (x0, y0) being
+    the start and (x1, y1) the end of each segment in world coordinates
+    """
+
+    def __init__(self, x0, y0, x1, y1):
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.y1 = np.asarray(y1, dtype=np.float64)
+        """True if any part of the segment is in sight of the player"""
+        self.in_sight = np.zeros(len(self.x0), dtype=bool)
+        self.visible_indices = np.empty(0, dtype=np.int64)
+        """buckets of the cells every segment borders, see build_index"""
+        self.spatial_index: SpatialHash = None
+
+    @staticmethod
+    def from_walls(
+        wall_up: np.ndarray, wall_left: np.ndarray,
+        cell_width, cell_height,
+        closed_borders=True,
+        origin=(0, 0)
+    ) -> 'WallSegments':
+        """
+        Coalesce the walls of a maze into as few segments as possible,
+        including the bottom and right border of the maze
+
+        :param wall_up: boolean array of shape (width, height), True if the cell has a wall above
+        :param wall_left: boolean array of shape (width, height), True if the cell has a wall to the left
+        :param cell_width: width of a cell in world coordinates
+        :param cell_height: height of a cell in world coordinates
+        :param closed_borders: if False, the bottom and right border are left out, e.g. because
+            they are the top and left walls of the next part of a chunked world
+        :param origin: world coordinates of the top left corner of the maze
+        """
+        width, height = wall_up.shape
+        border = 1 if closed_borders else 0
+
+        """one line of walls per row, the last line being the bottom border"""
+        horizontal = np.ones((height + border, width), dtype=bool)
+        horizontal[:height] = wall_up.T
+        rows, x_start, x_end = find_runs(horizontal)
+
+        """one line of walls per column, the last line being the right border"""
+        vertical = np.ones((width + border, height), dtype=bool)
+        vertical[:width] = wall_left
+        columns, y_start, y_end = find_runs(vertical)
+
+        return WallSegments(
+            origin[0] + np.concatenate([x_start * cell_width, columns * cell_width]),
+            origin[1] + np.concatenate([rows * cell_height, y_start * cell_height]),
+            origin[0] + np.concatenate([x_end * cell_width, columns * cell_width]),
+            origin[1] + np.concatenate([rows * cell_height, y_end * cell_height])
+        )
+
+    def __len__(self):
+        return len(self.x0)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held by the arrays of the segments, including their spatial index"""
+        arrays = [self.x0, self.y0, self.x1, self.y1, self.in_sight, self.visible_indices]
+        if self.spatial_index is not None:
+            arrays += [self.spatial_index.indices, self.spatial_index.offsets]
+        return sum(array.nbytes for array in arrays)
+
+    def build_index(self, cell_width, cell_height) -> SpatialHash:
+        """
+        Bucket every segment in each cell along it, by the midpoints of its cell long pieces.
+        A segment spanning many cells appears in many buckets, the index holds segment indices.
+        """
+        horizontal = self.y0 == self.y1
+        pieces = np.rint(np.where(
+            horizontal,
+            (self.x1 - self.x0) / cell_width,
+            (self.y1 - self.y0) / cell_height
+        )).astype(np.int64)
+        owners = np.repeat(np.arange(len(self)), pieces)
+        """position of each piece within its segment, offset to its midpoint"""
+        steps = np.arange(len(owners)) - np.repeat(np.cumsum(pieces) - pieces, pieces) + 0.5
+        piece_horizontal = horizontal[owners]
+        xs = self.x0[owners] + np.where(piece_horizontal, steps * cell_width, 0)
+        ys = self.y0[owners] + np.where(piece_horizontal, 0, steps * cell_height)
+
+        index = SpatialHash.build(cell_width, cell_height, xs, ys)
+        index.indices = owners[index.indices]
+        self.spatial_index = index
+        return index
+
+    def candidates(self, player: Player) -> np.ndarray:
+        """
+        :return: sorted indices of the segments whose buckets, or without a spatial index
+            whose bounding boxes, overlap the bounding box of the player's frustum
+        """
+        if self.spatial_index is not None:
+            return np.unique(self.spatial_index.sector_candidates(player))
+        x_min, y_min, x_max, y_max = player.frustum().bounding_box
+        return np.flatnonzero(
+            (self.x0 <= x_max) & (self.x1 >= x_min) & (self.y0 <= y_max) & (self.y1 >= y_min)
+        )
+
+    def distances_in_sectors(self, player: Player, bounds, indices: np.ndarray) -> np.ndarray:
+        """
+        Distance from the player to the closest point of some segments within each of the
+        adjacent sectors spanned counterclockwise from one bound to the next. The side of
+        every segment relative to each bound is computed once and shared by both sectors it bounds.
+
+        :param bounds: angles bounding the sectors, in counterclockwise order
+        :param indices: indices of the segments
+        :return: array of shape (len(bounds) - 1, len(indices)), inf where the segment does not cross the sector
+        """
+        ax, ay, dx, dy = self.relative_to(player, indices)
+        sides = [side_of(rad, ax, ay, dx, dy) for rad in (bound.rad for bound in bounds)]
+        distances = np.empty((len(bounds) - 1, len(indices)))
+        for sector, (lower, upper) in enumerate(zip(sides, sides[1:])):
+            cx, cy, crosses = closest_points(ax, ay, dx, dy, lower, upper)
+            distances[sector] = np.where(crosses, np.sqrt(cx * cx + cy * cy), np.inf)
+        return distances
+
+    def closest_points_in_sector(
+        self, player: Player, lb: Angle, ub: Angle, indices: np.ndarray = None
+    ) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        :param indices: indices of the segments, all segments if None
+        :return: closest point of each segment within the sector spanned counterclockwise from lb to ub,
+            relative to the player with the y-axis pointing upwards, and whether the segment crosses the sector at all
+        """
+        ax, ay, dx, dy = self.relative_to(player, np.arange(len(self)) if indices is None else indices)
+        return closest_points(ax, ay, dx, dy, side_of(lb.rad, ax, ay, dx, dy), side_of(ub.rad, ax, ay, dx, dy))
+
+    def relative_to(self, player: Player, indices: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        """
+        :return: start and direction of the segments relative to the player,
+            with the y-axis pointing upwards like the angles
+        """
+        x0, y0 = self.x0[indices], self.y0[indices]
+        return (
+            x0 - player.position.x,
+            player.position.y - y0,
+            self.x1[indices] - x0,
+            y0 - self.y1[indices]
+        )
+
+    def scan(self, player: Player) -> ScanResult:
+        """
+        Segment counterpart of ObstacleStore.scan, computing the closest
+        wall per direction analytically instead of point by point.
+        Only the segments near the frustum are clipped, see candidates,
+        and the frustum is the union of the three sections, so a single
+        pass over the candidates yields both.
+        """
+        radius = player.viewing_sector.radius
+        no_obstacle = radius + 1
+
+        lower_bound, upper_bound = player.viewing_bounds()
+        right_center_bound, left_center_bound, left_bound = player.section_bounds()
+
+        candidates = self.candidates(player)
+        distances = self.distances_in_sectors(
+            player,
+            (lower_bound, right_center_bound, left_center_bound, left_bound),
+            candidates
+        )
+        closest_in_frustum = distances.min(axis=0, initial=np.inf)
+
+        self.in_sight[self.visible_indices] = False
+        self.visible_indices = candidates[closest_in_frustum <= radius]
+        self.in_sight[self.visible_indices] = True
+
+        if closest_in_frustum.size and closest_in_frustum.min() <= Player.BODY_RADIUS:
+            return ScanResult(True, no_obstacle, no_obstacle, no_obstacle, len(candidates))
+
+        """left, center and right are the sectors in reverse order"""
+        closest = distances[::-1].min(axis=1, initial=np.inf)
+        return ScanResult(
+            False,
+            *(float(distance) if distance <= radius else no_obstacle for distance in closest),
+            len(candidates)
+        )
+
+    def sources_in_sight(self, player: Player) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        :return: indices of the segments in sight, and the angle and distance of
+            their closest points relative to the player
+        """
+        indices = self.visible_indices
+        lower_bound, upper_bound = player.viewing_bounds()
+        cx, cy, _ = self.closest_points_in_sector(player, lower_bound, upper_bound, indices)
+        return indices, np.arctan2(cy, cx) % (2 * np.pi), np.sqrt(cx * cx + cy * cy)
+
+
+def side_of(rad: float, ax, ay, dx, dy) -> (np.ndarray, np.ndarray):
+    """
+    :return: side of the start of each segment relative to the ray at angle rad,
+        positive to its left, and how the side changes along the segment
+    """
+    cos, sin = np.cos(rad), np.sin(rad)
+    return cos * ay - sin * ax, cos * dy - sin * dx
+
+
+def closest_points(ax, ay, dx, dy, lower_side, upper_side) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Clip each segment to the two half-planes bounding a sector and find the point closest to the origin
+
+    :param lower_side: side_of the lower bound of the sector
+    :param upper_side: side_of the upper bound of the sector
+    :return: closest point of each segment within the sector and whether the segment crosses the sector at all
+    """
+    t_start = np.zeros(len(ax))
+    t_end = np.ones(len(ax))
+
+    for (side_at_start, side_change), sign in ((lower_side, 1), (upper_side, -1)):
+        side_at_start = sign * side_at_start
+        side_change = sign * side_change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = -side_at_start / side_change
+        t_start = np.where(side_change > 0, np.maximum(t_start, crossing), t_start)
+        t_end = np.where(side_change < 0, np.minimum(t_end, crossing), t_end)
+        t_end = np.where((side_change == 0) & (side_at_start < 0), -1, t_end)
+
+    length_squared = dx * dx + dy * dy
+    closest_t = np.clip(-(ax * dx + ay * dy) / length_squared, t_start, t_end)
+    cx = ax + closest_t * dx
+    cy = ay + closest_t * dy
+    return cx, cy, t_start <= t_end
+
+
+def find_runs(walls: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Find all runs of consecutive True values along the last axis
+
+    :param walls: boolean array of shape (lines, length)
+    :return: line index, start and (exclusive) end of every run
+    """
+    padded = np.zeros((walls.shape[0], walls.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = walls
+    changes = np.diff(padded, axis=1)
+    starts = np.argwhere(changes == 1)
+    ends = np.argwhere(changes == -1)
+    return starts[:, 0], starts[:, 1], ends[:, 1]